@@ -0,0 +1,20 @@
+import pmdarima as pm
+
+
+def fit_order(y, spec):
+    """Fits a fixed (p,d,q)(P,D,Q,m) order - no order search."""
+    return pm.ARIMA(
+        order=spec["order"],
+        seasonal_order=spec["seasonal_order"],
+        with_intercept=spec["with_intercept"],
+        suppress_warnings=True
+    ).fit(y)
+
+
+def order_spec(model):
+    """A fitted model's order as {order, seasonal_order, with_intercept} (the model store's metadata keys)."""
+    return {
+        "order": tuple(int(v) for v in model.order),
+        "seasonal_order": tuple(int(v) for v in model.seasonal_order),
+        "with_intercept": bool(model.with_intercept),
+    }
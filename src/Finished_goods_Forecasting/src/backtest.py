@@ -0,0 +1,205 @@
+import pandas as pd
+import numpy as np
+import math
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from arima_orders import fit_order
+from data_loader import iter_table
+from fallback_forecast import fallback_forecasts
+from model_store import open_store
+from sales_matrix import get_sales_matrix, load_sales_matrix
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = BASE_DIR / "data"
+MODEL_PATH = BASE_DIR / "models"
+SALES_CSV = DATA_PATH / "sales_history.csv"
+ERRORS_CSV = MODEL_PATH / "backtest_errors.csv"
+FORECASTS_CSV = MODEL_PATH / "backtest_forecasts.csv"
+# Forecast origins per SKU, STEP days apart, the last one leaving room for the longest horizon
+N_ORIGINS = int(os.getenv("BACKTEST_ORIGINS", 8))
+STEP_DAYS = int(os.getenv("BACKTEST_STEP_DAYS", 7))
+HORIZONS = [int(h) for h in os.getenv("BACKTEST_HORIZONS", "7,14,30").split(",")]
+# Days of history required before the first origin
+MIN_TRAIN_DAYS = 40
+N_WORKERS = int(os.getenv("BACKTEST_WORKERS", os.cpu_count() or 1))
+# Wall-clock seconds for the whole run (0 = unlimited); origins not reached are left out
+TIME_BUDGET = float(os.getenv("BACKTEST_TIME_BUDGET", 0))
+warnings.filterwarnings("ignore")
+
+_worker_matrix = None
+
+
+def origin_offsets(n_obs, horizons=HORIZONS, n_origins=N_ORIGINS, step=STEP_DAYS):
+    """
+    Origins as offsets into a SKU's series (the first forecast day), oldest
+    first. Every origin has actuals for the longest horizon.
+    """
+    last = n_obs - max(horizons)
+    offsets = [last - k * step for k in range(n_origins)]
+    return sorted(o for o in offsets if o >= MIN_TRAIN_DAYS)
+
+
+def split_segments(offsets, n_segments):
+    """Consecutive runs of origins; each segment costs one fit plus updates."""
+    size = math.ceil(len(offsets) / max(1, n_segments))
+    return [offsets[i:i + size] for i in range(0, len(offsets), size)]
+
+
+def _backtest_job(sku_id, spec, offsets, horizons, deadline=None):
+    """
+    One SKU, one segment of origins: fits the stored order on the history
+    before the first origin, then moves forward with model.update() and
+    forecasts from every origin. Stops early (keeping what it has) once
+    `deadline` passes. Returns (sku_id, rows, message).
+    """
+    global _worker_matrix
+    try:
+        if _worker_matrix is None:
+            _worker_matrix = load_sales_matrix()
+        series = _worker_matrix.series(sku_id)
+        y = series.to_numpy(dtype=np.float64)
+        h_max = max(horizons)
+        rows = []
+        model, fitted_to = None, None
+        for origin in offsets:
+            if deadline and time.time() > deadline:
+                return sku_id, rows, f"budget spent after {len(rows) // len(horizons)} origins"
+            if model is None:
+                model = fit_order(y[:origin], spec)
+            elif origin > fitted_to:
+                model.update(y[fitted_to:origin])
+            fitted_to = origin
+            preds = np.maximum(np.asarray(model.predict(n_periods=h_max)), 0)
+            for h in horizons:
+                rows.append({"sku_id": sku_id, "method": "arima",
+                             "origin": series.index[origin].strftime("%Y-%m-%d"), "horizon": h,
+                             "forecast": float(preds[:h].sum()), "actual": float(y[origin:origin + h].sum())})
+        return sku_id, rows, f"{len(offsets)} origins"
+    except Exception as e:
+        return sku_id, [], f"Failed: {e}"
+
+
+def fallback_rows(matrix, sku_ids, horizons):
+    """Same origins for the vectorized fallback, one batch per distinct calendar origin."""
+    h_max = max(horizons)
+    by_origin = {}
+    for sku, row in zip(sku_ids, matrix.row_indices(sku_ids)):
+        first = int(matrix.first_idx[row])
+        n_obs = int(matrix.last_idx[row]) - first + 1
+        for offset in origin_offsets(n_obs, horizons):
+            by_origin.setdefault(first + offset, []).append(sku)
+
+    rows = []
+    for day, skus in sorted(by_origin.items()):
+        # The matrix as it looked on the day before the origin
+        view = matrix.before(matrix.dates[day])
+        demand, methods = fallback_forecasts(view, skus, h_max)
+        actual = np.asarray(matrix.values[matrix.row_indices(skus), day:day + h_max], dtype=np.float64)
+        origin = matrix.dates[day].strftime("%Y-%m-%d")
+        for i, sku in enumerate(skus):
+            for h in horizons:
+                rows.append({"sku_id": sku, "method": f"fallback:{methods[i]}", "origin": origin, "horizon": h,
+                             "forecast": float(demand[i, :h].sum()), "actual": float(actual[i, :h].sum())})
+    return rows
+
+
+def error_table(forecasts):
+    """
+    Per SKU, method and horizon over all origins, on h-day totals:
+    MAPE (origins with non-zero actuals), WAPE = sum|F - A| / sum A,
+    bias = sum(F - A) / sum A.
+    """
+    df = forecasts.assign(err=forecasts["forecast"] - forecasts["actual"])
+    df["abs_err"] = df["err"].abs()
+    df["ape"] = np.where(df["actual"] > 0, df["abs_err"] / df["actual"].where(df["actual"] > 0), np.nan)
+    g = df.groupby(["sku_id", "method", "horizon"], sort=True)
+    out = g.agg(origins=("origin", "nunique"), actual=("actual", "sum"), abs_err=("abs_err", "sum"),
+                err=("err", "sum"), mape=("ape", "mean")).reset_index()
+    denom = out["actual"].where(out["actual"] > 0)
+    out["wape"] = out["abs_err"] / denom
+    out["bias"] = out["err"] / denom
+    return out[["sku_id", "method", "horizon", "origins", "mape", "wape", "bias"]]
+
+
+def run_backtest(sku_ids=None, horizons=HORIZONS, n_workers=N_WORKERS, time_budget=TIME_BUDGET,
+                 include_fallback=True):
+    """
+    Rolling-origin backtest of the stored models' orders (and the fallback
+    baseline). Work is split into (SKU, origin segment) jobs so both SKUs
+    and origins spread across processes. Returns (errors, forecasts).
+    """
+    global _worker_matrix
+    start = time.time()
+    deadline = start + time_budget if time_budget else None
+    _worker_matrix = get_sales_matrix(lambda: iter_table("sales_history"), SALES_CSV)
+    store = open_store()
+    sku_ids = [s for s in (sku_ids or _worker_matrix.skus) if s in _worker_matrix]
+
+    specs = {}
+    for sku in sku_ids:
+        meta = store.meta(sku) if sku in store else {}
+        if "order" in meta:
+            specs[sku] = {k: meta[k] for k in ("order", "seasonal_order", "with_intercept")}
+    # Enough segments to keep every worker busy even with few SKUs
+    n_segments = max(1, math.ceil(2 * n_workers / max(1, len(specs))))
+    jobs = []
+    for sku, spec in specs.items():
+        offsets = origin_offsets(len(_worker_matrix.series(sku)), horizons)
+        jobs += [(sku, spec, seg, horizons, deadline) for seg in split_segments(offsets, n_segments)]
+    print(f"Backtesting {len(specs)} SKUs ({len(jobs)} jobs, {N_ORIGINS} origins every {STEP_DAYS}d, "
+          f"horizons {horizons})...")
+
+    rows = []
+    if n_workers <= 1:
+        for job in jobs:
+            sku, r, message = _backtest_job(*job)
+            rows += r
+            print(f"   {sku}: {message}")
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_backtest_job, *job) for job in jobs]
+            for fut in as_completed(futures):
+                sku, r, message = fut.result()
+                rows += r
+                print(f"   {sku}: {message}")
+
+    if include_fallback:
+        rows += fallback_rows(_worker_matrix, sku_ids, horizons)
+
+    forecasts = pd.DataFrame(rows, columns=["sku_id", "method", "origin", "horizon", "forecast", "actual"])
+    forecasts = forecasts.sort_values(["sku_id", "method", "origin", "horizon"], ignore_index=True)
+    print(f"Backtest finished in {time.time() - start:.1f}s")
+    return error_table(forecasts), forecasts
+
+
+def main():
+    print("="*60 + "\n   ROLLING-ORIGIN BACKTEST\n" + "="*60)
+    try:
+        errors, forecasts = run_backtest()
+    except FileNotFoundError as e:
+        print(e)
+        return
+    if errors.empty:
+        print("Nothing to backtest (no stored models with enough history).")
+        return
+
+    errors.to_csv(ERRORS_CSV, index=False)
+    forecasts.to_csv(FORECASTS_CSV, index=False)
+
+    summary = errors.assign(family=errors["method"].str.split(":").str[0]).groupby(["family", "horizon"]).agg(
+        skus=("sku_id", "nunique"), mape=("mape", "mean"), wape=("wape", "mean"), bias=("bias", "mean"))
+    try:
+        print(summary.reset_index().to_markdown(index=False, floatfmt=".3f"))
+    except ImportError:
+        print(summary.to_string())
+    print(f"\n✓ Errors per SKU/horizon saved to: {ERRORS_CSV}")
+    print(f"✓ Forecasts per origin saved to: {FORECASTS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import numpy as np
+import os
+from pathlib import Path
+from statistics import NormalDist
+
+# Exported arrays; everything a forecast needs, nothing from the fit history
+FIELDS = ["order", "seasonal_order", "design", "obs_intercept", "obs_cov",
+          "transition", "state_intercept", "state_cov_sel", "state", "state_cov", "nobs"]
+
+
+class CompactARIMA:
+    """
+    NumPy-only forecaster rebuilt from a fitted pmdarima/SARIMAX model.
+
+    Keeps the time-invariant state-space system (Z, d, H, T, c, RQR') and the
+    one-step-ahead predicted state a(n+1) with its covariance P(n+1). Point
+    forecasts iterate a <- T a + c, y = Z a + d; interval variances iterate
+    P <- T P T' + RQR', var = Z P Z' + H. This is exactly what statsmodels'
+    get_forecast() does for these models, without the training series,
+    filter output or result objects a pickled model carries.
+    """
+
+    def __init__(self, **arrays):
+        for name in FIELDS:
+            setattr(self, name, np.asarray(arrays[name]))
+
+    @property
+    def order_tuple(self):
+        return tuple(int(v) for v in self.order)
+
+    @property
+    def seasonal_order_tuple(self):
+        return tuple(int(v) for v in self.seasonal_order)
+
+    def predict(self, n_periods=10, return_conf_int=False, alpha=0.05):
+        Z, d, H = self.design, self.obs_intercept, self.obs_cov
+        T, c, RQR = self.transition, self.state_intercept, self.state_cov_sel
+        a = self.state.copy()
+        P = self.state_cov.copy()
+
+        mean = np.empty(n_periods)
+        var = np.empty(n_periods)
+        for h in range(n_periods):
+            mean[h] = (Z @ a + d)[0]
+            if return_conf_int:
+                var[h] = (Z @ P @ Z.T + H)[0, 0]
+                P = T @ P @ T.T + RQR
+            a = T @ a + c
+
+        if not return_conf_int:
+            return mean
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        half = z * np.sqrt(np.maximum(var, 0))
+        return mean, np.column_stack([mean - half, mean + half])
+
+    def to_arrays(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+def _last(matrix, ndim):
+    """System matrices are (k, k) or (k, k, nobs) when time-varying."""
+    if matrix.ndim == ndim:
+        return matrix
+    if not np.allclose(matrix, matrix[..., -1:]):
+        raise ValueError("time-varying state space (e.g. a time trend) is not supported")
+    return matrix[..., -1]
+
+
+def export_compact(model):
+    """Builds a CompactARIMA from a fitted pmdarima ARIMA. Raises ValueError if unsupported."""
+    res = model.arima_res_
+    if getattr(res.model, "k_exog", 0):
+        raise ValueError("models with exogenous regressors are not supported")
+    ssm = res.model.ssm
+    R = _last(ssm["selection"], 2)
+    Q = _last(ssm["state_cov"], 2)
+    filt = res.filter_results
+    return CompactARIMA(
+        order=np.array(model.order, dtype=np.int64),
+        seasonal_order=np.array(model.seasonal_order, dtype=np.int64),
+        design=_last(ssm["design"], 2),
+        obs_intercept=_last(ssm["obs_intercept"], 1),
+        obs_cov=_last(ssm["obs_cov"], 2),
+        transition=_last(ssm["transition"], 2),
+        state_intercept=_last(ssm["state_intercept"], 1),
+        state_cov_sel=R @ Q @ R.T,
+        state=filt.predicted_state[:, -1].copy(),
+        state_cov=filt.predicted_state_cov[:, :, -1].copy(),
+        nobs=np.array(res.nobs, dtype=np.int64),
+    )
+
+
+def save_compact(compact, path):
+    path = Path(path)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp, **compact.to_arrays())
+    os.replace(tmp, path)
+    return path
+
+
+def load_compact(path):
+    with np.load(path, allow_pickle=False) as z:
+        return CompactARIMA(**{name: z[name] for name in FIELDS})
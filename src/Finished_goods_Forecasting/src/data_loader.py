@@ -0,0 +1,213 @@
+import pandas as pd
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = BASE_DIR / "data"
+CACHE_PATH = DATA_PATH / "cache"
+DATE_FORMAT = "%Y-%m-%d"
+# Rows per chunk when a table is streamed instead of loaded whole (iter_table)
+CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", 1_000_000))
+
+# Declared schemas for the CSV inputs: only the listed columns are read,
+# with fixed dtypes and date formats instead of pandas' type sniffing.
+#   columns     - {column: dtype}; "date" columns are parsed with DATE_FORMAT
+#   std_date    - column copied to "standard_date" (what the forecaster keys on)
+SCHEMAS = {
+    "sales_history": {
+        "file": "sales_history.csv",
+        "columns": {
+            "date": "date",
+            "sku_id": "category",
+            "region": "category",
+            "distributor_id": "category",
+            "quantity_sold": "float64",
+        },
+    },
+    "finished_goods_inventory": {
+        "file": "finished_goods_inventory.csv",
+        "columns": {
+            "sku_id": "category",
+            "sku_name": "string",
+            "category": "category",
+            "current_stock_units": "float64",
+            "last_produced_date": "date",
+        },
+        "std_date": "last_produced_date",
+    },
+    "production_plan": {
+        "file": "production_plan.csv",
+        "columns": {
+            "sku_id": "category",
+            "planned_date": "date",
+            "planned_quantity": "float64",
+            "actual_produced_quantity": "float64",
+        },
+        "std_date": "planned_date",
+    },
+    "purchase_orders": {
+        "file": "purchase_orders.csv",
+        "columns": {
+            "po_id": "string",
+            "supplier_id": "category",
+            "material_id": "category",
+            "order_date": "date",
+            "expected_delivery_date": "date",
+            "actual_delivery_date": "date",
+            "quantity_kg": "float64",
+            "status": "category",
+        },
+        "std_date": "order_date",
+    },
+    # Optional inputs for material planning (material_requirements.py)
+    "bill_of_materials": {
+        "file": "bill_of_materials.csv",
+        "columns": {
+            "sku_id": "category",
+            "material_id": "category",
+            "kg_per_unit": "float64",
+        },
+    },
+    "raw_material_inventory": {
+        "file": "raw_material_inventory.csv",
+        "columns": {
+            "material_id": "category",
+            "material_name": "string",
+            "current_stock_kg": "float64",
+        },
+    },
+}
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = "feather"
+except ImportError:
+    # Without pyarrow the cache falls back to pickle (still skips CSV parsing)
+    CACHE_FORMAT = "pickle"
+
+
+def _schema_key(schema):
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _parse_dates(values):
+    try:
+        return pd.to_datetime(values, format=DATE_FORMAT)
+    except (ValueError, TypeError):
+        # Source not in the declared format; let pandas infer it
+        return pd.to_datetime(values)
+
+
+def _csv_options(path, schema):
+    """read_csv keyword arguments for the declared columns/dtypes."""
+    cols = schema["columns"]
+    header = [c.lower().strip() for c in pd.read_csv(path, nrows=0).columns]
+    present = [c for c in cols if c in header]
+    dtypes = {c: t for c, t in cols.items() if c in present and t != "date"}
+    return {"header": 0, "names": header, "usecols": present, "dtype": dtypes}
+
+
+def _finish(df, schema):
+    """Parses declared date columns and adds standard_date."""
+    for c, t in schema["columns"].items():
+        if t == "date" and c in df.columns:
+            df[c] = _parse_dates(df[c])
+    std = schema.get("std_date")
+    if std in df.columns:
+        df["standard_date"] = df[std]
+    return df
+
+
+def _read_csv(path, schema):
+    """CSV -> DataFrame using the declared columns/dtypes."""
+    return _finish(pd.read_csv(path, **_csv_options(path, schema)), schema)
+
+
+def _cache_files(name):
+    ext = "feather" if CACHE_FORMAT == "feather" else "pkl"
+    return CACHE_PATH / f"{name}.{ext}", CACHE_PATH / f"{name}.meta.json"
+
+
+def _cache_valid(source, meta_path, schema_key):
+    """mtime/size match -> valid; otherwise fall back to the content hash."""
+    if not meta_path.exists():
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("schema") != schema_key or meta.get("format") != CACHE_FORMAT:
+        return False
+    stat = source.stat()
+    if meta.get("mtime") == stat.st_mtime and meta.get("size") == stat.st_size:
+        return True
+    if meta.get("size") == stat.st_size and meta.get("sha1") == _file_hash(source):
+        # Touched but not modified: refresh the stamp so the next check is cheap
+        meta["mtime"] = stat.st_mtime
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        return True
+    return False
+
+
+def load_table(name, use_cache=True, required=False):
+    """
+    Shared loader for the forecasting inputs (see SCHEMAS).
+    Returns an empty DataFrame when the CSV is missing, unless `required`.
+    Parsed tables are cached under data/cache and reused until the source
+    CSV's content changes.
+    """
+    schema = SCHEMAS[name]
+    source = DATA_PATH / schema["file"]
+    if not source.exists():
+        if required:
+            raise FileNotFoundError(f"Missing file: {source}")
+        return pd.DataFrame()
+
+    if not use_cache:
+        return _read_csv(source, schema)
+
+    cache_file, meta_path = _cache_files(name)
+    key = _schema_key(schema)
+    if cache_file.exists() and _cache_valid(source, meta_path, key):
+        if CACHE_FORMAT == "feather":
+            return pd.read_feather(cache_file)
+        return pd.read_pickle(cache_file)
+
+    df = _read_csv(source, schema)
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    tmp = cache_file.with_name(cache_file.name + ".tmp")
+    if CACHE_FORMAT == "feather":
+        df.to_feather(tmp)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, cache_file)
+    stat = source.stat()
+    with open(meta_path, "w") as f:
+        json.dump({"mtime": stat.st_mtime, "size": stat.st_size, "sha1": _file_hash(source),
+                   "schema": key, "format": CACHE_FORMAT}, f)
+    return df
+
+
+def iter_table(name, chunksize=CHUNK_ROWS):
+    """
+    Streams a table as parsed DataFrame chunks of at most `chunksize` rows,
+    for inputs too large to hold in memory. Bypasses the parsed-table cache.
+    Categorical columns get per-chunk categories.
+    """
+    schema = SCHEMAS[name]
+    source = DATA_PATH / schema["file"]
+    if not source.exists():
+        raise FileNotFoundError(f"Missing file: {source}")
+    with pd.read_csv(source, chunksize=chunksize, **_csv_options(source, schema)) as reader:
+        for chunk in reader:
+            yield _finish(chunk, schema)
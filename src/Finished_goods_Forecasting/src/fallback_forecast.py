@@ -0,0 +1,109 @@
+import numpy as np
+import os
+
+# --- CONFIGURATION ---
+# "auto" picks the best of the methods below per SKU on a holdout;
+# otherwise one of METHODS is used for every fallback SKU
+FALLBACK_METHOD = os.getenv("FORECAST_FALLBACK", "auto")
+SEASON = 7
+MA_WINDOW = int(os.getenv("FALLBACK_MA_WINDOW", 28))
+SES_ALPHA = float(os.getenv("FALLBACK_SES_ALPHA", 0.3))
+# Days of history the fallback looks at, and the holdout used by "auto"
+LOOKBACK_DAYS = int(os.getenv("FALLBACK_LOOKBACK_DAYS", 182))
+HOLDOUT_DAYS = 14
+METHODS = ["seasonal_naive", "moving_average", "ses"]
+
+
+def seasonal_naive(Y, observed, n_days, season=SEASON):
+    """Repeats each SKU's last full week; SKUs with less than a week repeat their mean."""
+    n_sku, n_hist = Y.shape
+    out = np.zeros((n_sku, n_days))
+    if n_hist == 0:
+        return out
+    if n_hist >= season:
+        out[:] = np.tile(Y[:, -season:], -(-n_days // season))[:, :n_days]
+        short = observed[:, -season:].sum(axis=1) < season
+    else:
+        short = np.ones(n_sku, dtype=bool)
+    out[short] = moving_average(Y[short], observed[short], n_days, window=season)
+    return out
+
+
+def moving_average(Y, observed, n_days, window=MA_WINDOW):
+    """Flat forecast: mean over the observed days of the last `window` days."""
+    n = observed[:, -window:].sum(axis=1)
+    level = np.divide(Y[:, -window:].sum(axis=1), n, out=np.zeros(len(Y)), where=n > 0)
+    return np.repeat(level[:, None], n_days, axis=1)
+
+
+def ses(Y, observed, n_days, alpha=SES_ALPHA):
+    """Simple exponential smoothing, one vectorized update per day across all SKUs."""
+    level = np.zeros(len(Y))
+    started = np.zeros(len(Y), dtype=bool)
+    for t in range(Y.shape[1]):
+        obs = observed[:, t]
+        level = np.where(obs & started, alpha * Y[:, t] + (1 - alpha) * level,
+                         np.where(obs, Y[:, t], level))
+        started |= obs
+    return np.repeat(level[:, None], n_days, axis=1)
+
+
+FORECASTERS = {"seasonal_naive": seasonal_naive, "moving_average": moving_average, "ses": ses}
+
+
+def _forecast(Y, observed, n_days, method):
+    """(demand, method per row) for rows that all have history."""
+    if method != "auto":
+        return FORECASTERS[method](Y, observed, n_days), np.full(len(Y), method, dtype=object)
+    # Score every method on the last HOLDOUT_DAYS, then forecast with the winner
+    fit, test = Y[:, :-HOLDOUT_DAYS], Y[:, -HOLDOUT_DAYS:]
+    fit_obs, test_obs = observed[:, :-HOLDOUT_DAYS], observed[:, -HOLDOUT_DAYS:]
+    errors = np.stack([
+        (np.abs(FORECASTERS[m](fit, fit_obs, HOLDOUT_DAYS) - test) * test_obs).sum(axis=1)
+        for m in METHODS
+    ])
+    best = errors.argmin(axis=0)
+    paths = np.stack([FORECASTERS[m](Y, observed, n_days) for m in METHODS])
+    return paths[best, np.arange(len(best))], np.asarray(METHODS, dtype=object)[best]
+
+
+def fallback_forecasts(matrix, sku_ids, n_days, method=FALLBACK_METHOD):
+    """
+    Daily demand for SKUs without a usable model, computed for all of them
+    at once from the SKU x day sales matrix (see sales_matrix).
+    Returns (demand of shape (len(sku_ids), n_days), method per SKU).
+    SKUs with no sales history get zero demand and method "none".
+    """
+    demand = np.zeros((len(sku_ids), n_days))
+    methods = np.full(len(sku_ids), "none", dtype=object)
+    if matrix is None or not len(sku_ids):
+        return demand, methods
+
+    Y, observed, found = matrix.history(sku_ids, LOOKBACK_DAYS)
+    if found.any():
+        demand[found], methods[found] = _forecast(Y[found], observed[found], n_days, method)
+    np.maximum(demand, 0, out=demand)
+    return demand, methods
+
+
+def holdout_mape(matrix, sku_ids, days=HOLDOUT_DAYS, method=FALLBACK_METHOD):
+    """
+    Batch validation of the fallback: forecasts the last `days` of each SKU's
+    history from the days before and scores it like train_models does (MAPE,
+    zero actuals replaced by 1e-6). Returns (mape per SKU, method per SKU);
+    NaN / "none" for SKUs without history.
+    """
+    mape = np.full(len(sku_ids), np.nan)
+    methods = np.full(len(sku_ids), "none", dtype=object)
+    if matrix is None or not len(sku_ids):
+        return mape, methods
+
+    Y, observed, found = matrix.history(sku_ids, LOOKBACK_DAYS + days)
+    if found.any():
+        Y, observed = Y[found], observed[found]
+        preds, methods[found] = _forecast(Y[:, :-days], observed[:, :-days], days, method)
+        test, test_obs = Y[:, -days:], observed[:, -days:]
+        err = np.abs(test - np.maximum(preds, 0)) / np.where(test == 0, 1e-6, np.abs(test))
+        n = test_obs.sum(axis=1)
+        mape[found] = np.divide((err * test_obs).sum(axis=1), n, out=np.full(len(n), np.nan), where=n > 0)
+    return mape, methods
@@ -0,0 +1,103 @@
+import pandas as pd
+import numpy as np
+import os
+from pathlib import Path
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = BASE_DIR / "models"
+CACHE_FILE = MODEL_PATH / "forecast_cache.npz"
+# Days of predicted demand cached per SKU (must cover the longest horizon)
+CACHE_DAYS = int(os.getenv("FORECAST_CACHE_DAYS", 60))
+CACHE_ALPHA = 0.05
+
+
+def forecast_origin(meta):
+    """First forecast day of a model: the day after its trained_through watermark."""
+    through = meta.get("trained_through")
+    return (pd.Timestamp(through) + pd.Timedelta(days=1)).strftime("%Y-%m-%d") if through else ""
+
+
+class ForecastCache:
+    """
+    Columnar cache of predicted daily demand paths, one row per SKU:
+    sku_id, model version, forecast origin, mean / lower / upper (n x days).
+    A row is only valid for the exact model version and origin it was
+    computed from.
+    """
+
+    def __init__(self, sku_ids, versions, origins, mean, lower, upper):
+        self.sku_ids = np.asarray(sku_ids, dtype=str)
+        self.versions = np.asarray(versions, dtype=str)
+        self.origins = np.asarray(origins, dtype=str)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self._rows = {sku: i for i, sku in enumerate(self.sku_ids)}
+
+    @classmethod
+    def empty(cls, days=CACHE_DAYS):
+        z = np.zeros((0, days))
+        return cls([], [], [], z, z, z)
+
+    @property
+    def days(self):
+        return self.mean.shape[1]
+
+    def __len__(self):
+        return len(self.sku_ids)
+
+    def lookup(self, sku_id, version, origin, n_days):
+        """Cached (mean, conf_int) for `n_days`, or None on a miss."""
+        i = self._rows.get(sku_id)
+        if i is None or self.versions[i] != version or self.origins[i] != origin or n_days > self.days:
+            return None
+        return self.mean[i, :n_days], np.column_stack([self.lower[i, :n_days], self.upper[i, :n_days]])
+
+    def save(self, path=CACHE_FILE):
+        path = Path(path)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp, sku_ids=self.sku_ids, versions=self.versions, origins=self.origins,
+                 mean=self.mean, lower=self.lower, upper=self.upper)
+        os.replace(tmp, path)
+        return path
+
+
+def load_forecast_cache(path=CACHE_FILE):
+    if not Path(path).exists():
+        return ForecastCache.empty()
+    with np.load(path, allow_pickle=False) as z:
+        return ForecastCache(z["sku_ids"], z["versions"], z["origins"], z["mean"], z["lower"], z["upper"])
+
+
+def refresh_forecast_cache(store, days=CACHE_DAYS, path=CACHE_FILE):
+    """
+    Brings the cache in line with the model store: rows whose version still
+    matches are kept, every other stored SKU is predicted once. Returns the
+    number of SKUs recomputed.
+    """
+    old = load_forecast_cache(path)
+    keep, new_rows = [], []
+    for sku in store.skus():
+        version, origin = store.version(sku), forecast_origin(store.meta(sku))
+        if old.days >= days and old.lookup(sku, version, origin, days) is not None:
+            keep.append((sku, version, origin, old._rows[sku]))
+            continue
+        try:
+            mean, conf = store.get_predictor(sku).predict(n_periods=days, return_conf_int=True, alpha=CACHE_ALPHA)
+        except Exception as e:
+            print(f"   Forecast cache: {sku} skipped ({e})")
+            continue
+        new_rows.append((sku, version, origin, np.asarray(mean), np.asarray(conf)))
+
+    rows = sorted(
+        [(s, v, o, old.mean[i, :days], old.lower[i, :days], old.upper[i, :days]) for s, v, o, i in keep]
+        + [(s, v, o, m, c[:, 0], c[:, 1]) for s, v, o, m, c in new_rows]
+    )
+    if rows:
+        skus, versions, origins, mean, lower, upper = zip(*rows)
+        cache = ForecastCache(skus, versions, origins, np.vstack(mean), np.vstack(lower), np.vstack(upper))
+    else:
+        cache = ForecastCache.empty(days)
+    cache.save(path)
+    return len(new_rows)
@@ -0,0 +1,107 @@
+import pandas as pd
+import numpy as np
+import os
+from pathlib import Path
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+CURVES_PATH = BASE_DIR / "forecast_curves.npz"
+
+ALERT_LEVELS = ["CRITICAL", "WARNING", "ALERT"]
+
+
+class ForecastCurves:
+    """
+    Per-SKU daily cumulative demand and supply curves.
+    Row i, column t holds the total up to and including day t + 1 after the
+    origin, so any horizon h <= n_days is answered by looking up column h - 1.
+    """
+
+    def __init__(self, sku_ids, origin, stock, cum_demand, cum_supply):
+        self.sku_ids = np.asarray(sku_ids, dtype=object)
+        self.origin = pd.Timestamp(origin).normalize()
+        self.stock = np.asarray(stock, dtype=np.float64)
+        self.cum_demand = np.asarray(cum_demand, dtype=np.float64)
+        self.cum_supply = np.asarray(cum_supply, dtype=np.float64)
+
+    @property
+    def n_days(self):
+        return self.cum_demand.shape[1]
+
+    @property
+    def balance(self):
+        """Projected stock at the end of each day: stock - demand + supply."""
+        return self.stock[:, None] - self.cum_demand + self.cum_supply
+
+    def _cols(self, horizons):
+        horizons = np.asarray(horizons, dtype=int)
+        if horizons.min() < 1 or horizons.max() > self.n_days:
+            raise ValueError(f"Horizons must be within 1..{self.n_days} days, got {horizons.tolist()}")
+        return horizons - 1
+
+    def demand_at(self, horizons):
+        return self.cum_demand[:, self._cols(horizons)]
+
+    def supply_at(self, horizons):
+        return self.cum_supply[:, self._cols(horizons)]
+
+    def balance_at(self, horizons):
+        cols = self._cols(horizons)
+        return self.stock[:, None] - self.cum_demand[:, cols] + self.cum_supply[:, cols]
+
+    def stockout_day(self):
+        """First day (1-based) the balance goes negative; 0 if it never does."""
+        negative = self.balance < 0
+        return np.where(negative.any(axis=1), negative.argmax(axis=1) + 1, 0)
+
+    def stockout_date(self):
+        days = self.stockout_day()
+        dates = self.origin + pd.to_timedelta(days, unit="D")
+        return np.where(days > 0, dates.strftime("%Y-%m-%d"), None)
+
+    def to_frame(self, horizons):
+        """Forecast / supply / balance columns for any list of horizons."""
+        out = {"sku_id": self.sku_ids}
+        for name, values in [("forecast", self.demand_at(horizons)),
+                             ("supply", self.supply_at(horizons)),
+                             ("balance", self.balance_at(horizons))]:
+            for j, h in enumerate(horizons):
+                out[f"{name}_{h}d"] = np.round(values[:, j], 1)
+        out["stockout_date"] = self.stockout_date()
+        return pd.DataFrame(out)
+
+    def save(self, path=CURVES_PATH):
+        # float32 keeps the file small; values are unit counts, not money
+        tmp = Path(path).with_suffix(".tmp.npz")
+        np.savez_compressed(
+            tmp,
+            sku_ids=self.sku_ids.astype(str),
+            origin=np.array(self.origin.strftime("%Y-%m-%d")),
+            stock=self.stock,
+            cum_demand=self.cum_demand.astype(np.float32),
+            cum_supply=self.cum_supply.astype(np.float32),
+        )
+        os.replace(tmp, path)
+        return path
+
+
+def load_curves(path=CURVES_PATH):
+    if not Path(path).exists():
+        return None
+    with np.load(path, allow_pickle=False) as z:
+        return ForecastCurves(z["sku_ids"], str(z["origin"]), z["stock"], z["cum_demand"], z["cum_supply"])
+
+
+def alert_status(balances, horizons, base_status):
+    """
+    Alert label from the first horizon whose balance is negative:
+    CRITICAL for the shortest horizon, WARNING for the next, ALERT beyond.
+    Only rows whose base status is "OK" are relabelled.
+    """
+    ok = np.asarray(base_status) == "OK"
+    conditions, labels = [], []
+    for j, h in enumerate(horizons):
+        level = ALERT_LEVELS[min(j, len(ALERT_LEVELS) - 1)]
+        conditions.append(ok & (balances[:, j] < 0))
+        labels.append(f"{level}: Stockout < {h}d")
+    return np.select(conditions, labels, default=np.asarray(base_status, dtype=object))
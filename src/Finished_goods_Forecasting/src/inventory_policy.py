@@ -0,0 +1,127 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from pathlib import Path
+from statistics import NormalDist
+
+from data_loader import load_table
+from forecast_curves import CURVES_PATH, load_curves
+from sales_matrix import sales_history_matrix
+from stockout_risk import demand_spread, supply_scenarios
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+POLICY_JSON = BASE_DIR / "inventory_policy.json"
+# Target cycle service level (probability of no stockout during a replenishment cycle)
+SERVICE_LEVEL = float(os.getenv("POLICY_SERVICE_LEVEL", 0.95))
+# Replenishment lead time in days, unless the inventory has a lead_time_days column
+LEAD_TIME_DAYS = int(os.getenv("POLICY_LEAD_TIME_DAYS", 7))
+# Days between order reviews; orders bring the position up to cover lead time + review
+REVIEW_DAYS = int(os.getenv("POLICY_REVIEW_DAYS", 7))
+
+
+def z_scores(service_level):
+    """Standard normal quantile per row; one inv_cdf call per distinct level."""
+    levels, inverse = np.unique(np.asarray(service_level, dtype=np.float64), return_inverse=True)
+    return np.array([NormalDist().inv_cdf(p) for p in levels])[inverse.reshape(-1)]
+
+
+def _take(cum, days):
+    """cum[i, days[i] - 1] per row, 0 where days[i] == 0."""
+    idx = np.clip(days - 1, 0, cum.shape[1] - 1)
+    return np.where(days > 0, np.take_along_axis(cum, idx[:, None], axis=1)[:, 0], 0.0)
+
+
+def optimize_policy(daily_demand, sigma, stock, cum_supply, lead_time, service_level=SERVICE_LEVEL,
+                    review_days=REVIEW_DAYS, lead_time_std=0.0):
+    """
+    Safety stock, reorder point and order quantity for every row (SKU or
+    SKU x location) in one pass; all inputs are arrays over rows, daily
+    ones of shape (n_rows, n_days).
+
+    - demand over lead time:  sum of the forecast over the next L days
+    - safety stock:           z * sqrt(sum of daily variances over L + mean daily demand^2 * lead_time_std^2)
+    - reorder point:          lead-time demand + safety stock
+    - order-up-to level:      demand over L + review_days, plus safety stock
+    - inventory position:     stock + supply due within the lead time
+    - order quantity:         order-up-to - position when the position is at or below the reorder point
+
+    L + review_days is capped at the forecast length. Returns a dict of arrays.
+    """
+    daily_demand = np.asarray(daily_demand, dtype=np.float64)
+    n_rows, n_days = daily_demand.shape
+    lead_time = np.clip(np.broadcast_to(np.asarray(lead_time, dtype=np.int64), n_rows), 0, n_days)
+    cover = np.minimum(lead_time + review_days, n_days)
+    service_level = np.broadcast_to(np.asarray(service_level, dtype=np.float64), n_rows)
+
+    cum_demand = np.cumsum(daily_demand, axis=1)
+    cum_var = np.cumsum(np.asarray(sigma, dtype=np.float64) ** 2, axis=1)
+    lt_demand = _take(cum_demand, lead_time)
+    mean_daily = np.divide(lt_demand, lead_time, out=daily_demand[:, 0].copy(), where=lead_time > 0)
+
+    safety = z_scores(service_level) * np.sqrt(_take(cum_var, lead_time) + (mean_daily * lead_time_std) ** 2)
+    safety = np.maximum(safety, 0)
+    reorder_point = lt_demand + safety
+    order_up_to = _take(cum_demand, cover) + safety
+    position = np.asarray(stock, dtype=np.float64) + _take(np.asarray(cum_supply, dtype=np.float64), lead_time)
+    reorder = position <= reorder_point
+    return {
+        "lead_time_days": lead_time,
+        "service_level": service_level,
+        "lead_time_demand": lt_demand,
+        "safety_stock": safety,
+        "reorder_point": reorder_point,
+        "order_up_to": order_up_to,
+        "inventory_position": position,
+        "reorder": reorder,
+        "order_qty": np.where(reorder, np.maximum(order_up_to - position, 0), 0.0),
+    }
+
+
+def lead_time_std(po_df):
+    """Spread (days) of past purchase-order lateness, 0 without delivery history."""
+    (days, probs), _ = supply_scenarios(po_df, pd.DataFrame())
+    mean = (days * probs).sum()
+    return float(np.sqrt((probs * (days - mean) ** 2).sum()))
+
+
+def policy_frame(sku_ids, policy):
+    out = {"sku_id": np.asarray(sku_ids, dtype=object)}
+    for k, v in policy.items():
+        out[k] = np.round(v, 1) if v.dtype.kind == "f" and k != "service_level" else v
+    return pd.DataFrame(out)
+
+
+def main():
+    print("="*60 + "\n   SAFETY STOCK / REORDER POINT OPTIMIZER\n" + "="*60)
+    curves = load_curves(CURVES_PATH)
+    if curves is None:
+        print(f"No forecast curves at {CURVES_PATH}; run the forecaster first.")
+        return
+    inv = load_table("finished_goods_inventory")
+    lead_time = LEAD_TIME_DAYS
+    if "lead_time_days" in inv.columns:
+        lead_time = (inv.set_index(inv["sku_id"].astype(str))["lead_time_days"]
+                     .reindex(curves.sku_ids).fillna(LEAD_TIME_DAYS).to_numpy())
+
+    sigma = demand_spread(curves, matrix=sales_history_matrix())
+    start = time.time()
+    policy = optimize_policy(np.diff(curves.cum_demand, axis=1, prepend=0.0), sigma, curves.stock, curves.cum_supply,
+                             lead_time, lead_time_std=lead_time_std(load_table("purchase_orders")))
+    print(f"Optimized {len(curves.sku_ids)} SKUs in {time.time() - start:.3f}s "
+          f"(service level {SERVICE_LEVEL:.0%}, review every {REVIEW_DAYS}d)")
+
+    df = policy_frame(curves.sku_ids, policy).sort_values("order_qty", ascending=False)
+    cols = ["sku_id", "safety_stock", "reorder_point", "inventory_position", "order_qty"]
+    try:
+        print(df[cols].head(15).to_markdown(index=False, floatfmt=".1f"))
+    except ImportError:
+        print(df[cols].head(15).to_string(index=False))
+    df.to_json(POLICY_JSON, orient='records', indent=4)
+    print(f"\n✓ {int(df['reorder'].sum())} SKUs at or below their reorder point")
+    print(f"✓ Policy saved to: {POLICY_JSON}")
+
+
+if __name__ == "__main__":
+    main()
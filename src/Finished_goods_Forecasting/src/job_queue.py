@@ -0,0 +1,324 @@
+import joblib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# --- CONFIGURATION ---
+# Seconds a leased job stays owned without a heartbeat; a crashed worker's
+# jobs become available again after this
+LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", 120))
+# A job that has been leased this many times without finishing is failed
+MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", 3))
+POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", 2))
+# Workers exit after this many seconds without finding work, unless a run
+# they worked on still has leased jobs that may expire and need taking over
+IDLE_EXIT_SECONDS = float(os.getenv("QUEUE_IDLE_EXIT_SECONDS", 60))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL,
+    run_dir TEXT,
+    info TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id TEXT,
+    seq INTEGER,
+    sku_id TEXT,
+    args TEXT,
+    status TEXT,              -- pending | leased | done | failed
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER DEFAULT 0,
+    result_path TEXT,
+    message TEXT,
+    PRIMARY KEY (run_id, sku_id)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (run_id, status, seq);
+"""
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:4]}"
+
+
+class JobQueue:
+    """
+    Per-SKU training jobs in a SQLite file on shared storage.
+
+    A job is leased by one worker at a time; the lease expires after
+    `lease_seconds` unless the worker renews it (heartbeat), so jobs held by
+    a crashed worker are picked up again. Workers write their result
+    artifact under the run's directory next to the database and mark the
+    job done; the coordinator collects the artifacts when nothing is left.
+    The database needs a filesystem with working file locks (local disk,
+    or network storage with POSIX locking).
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(self.path.parent, exist_ok=True)
+        db = self._connect()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _transaction(self, fn):
+        """Runs fn(db) inside BEGIN IMMEDIATE (one writer at a time)."""
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            out = fn(db)
+            db.execute("COMMIT")
+            return out
+        except BaseException:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    # --- coordinator ---
+    def create_run(self, info=None):
+        """New run with its own directory for inputs/results. Returns (run_id, run_dir)."""
+        run_id = time.strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        run_dir = self.path.parent / f"{self.path.stem}_runs" / run_id
+        os.makedirs(run_dir / "results", exist_ok=True)
+        self._transaction(lambda db: db.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?)", (run_id, time.time(), str(run_dir), json.dumps(info or {}))))
+        return run_id, run_dir
+
+    def enqueue(self, run_id, jobs):
+        """jobs: [(sku_id, args dict)], leased in the given order."""
+        rows = [(run_id, i, sku, json.dumps(args), "pending") for i, (sku, args) in enumerate(jobs)]
+        self._transaction(lambda db: db.executemany(
+            "INSERT INTO jobs (run_id, seq, sku_id, args, status) VALUES (?, ?, ?, ?, ?)", rows))
+
+    def counts(self, run_id=None):
+        """{status: n} for one run, or over all runs."""
+        db = self._connect()
+        try:
+            if run_id is None:
+                cur = db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            else:
+                cur = db.execute("SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (run_id,))
+            return dict(cur.fetchall())
+        finally:
+            db.close()
+
+    def jobs(self, run_id):
+        db = self._connect()
+        try:
+            return [dict(r) for r in db.execute("SELECT * FROM jobs WHERE run_id = ? ORDER BY seq", (run_id,))]
+        finally:
+            db.close()
+
+    def run_info(self, run_id):
+        db = self._connect()
+        try:
+            row = db.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            return {"run_id": row["run_id"], "run_dir": row["run_dir"], **json.loads(row["info"])} if row else None
+        finally:
+            db.close()
+
+    def reclaim_expired(self, run_id=None):
+        """
+        Expired leases (of one run, or of all runs) go back to pending, or
+        to failed once they have used up max_attempts. Returns the number
+        of jobs reclaimed.
+        """
+        return self._transaction(lambda db: self._reclaim(db, time.time(), run_id))
+
+    def _reclaim(self, db, now, run_id=None):
+        scope, params = ("AND run_id = ?", (run_id,)) if run_id is not None else ("", ())
+        # Jobs whose workers died too often are failed instead of retried forever
+        failed = db.execute(
+            "UPDATE jobs SET status = 'failed', message = 'lease expired ' || attempts || ' times', "
+            "lease_expires = NULL WHERE status = 'leased' AND lease_expires < ? AND attempts >= ? " + scope,
+            (now, self.max_attempts, *params)).rowcount
+        pending = db.execute(
+            "UPDATE jobs SET status = 'pending', worker = NULL, lease_expires = NULL "
+            "WHERE status = 'leased' AND lease_expires < ? " + scope, (now, *params)).rowcount
+        return failed + pending
+
+    def wait(self, run_id, timeout=None, poll=POLL_SECONDS, progress=None):
+        """
+        Coordinator loop: blocks until every job of the run is done or
+        failed, reclaiming expired leases on each poll so a crashed worker's
+        job does not depend on another worker noticing it. After `timeout`
+        seconds the unfinished jobs are failed. `progress(counts)` is called
+        whenever the number of finished jobs changes. Returns the final counts.
+        """
+        deadline = time.time() + timeout if timeout else None
+        reported = None
+        while True:
+            self.reclaim_expired(run_id)
+            counts = self.counts(run_id)
+            unfinished = counts.get("pending", 0) + counts.get("leased", 0)
+            finished = counts.get("done", 0) + counts.get("failed", 0)
+            if progress and finished != reported:
+                progress(counts)
+                reported = finished
+            if not unfinished:
+                return counts
+            if deadline is not None and time.time() > deadline:
+                self._transaction(lambda db: db.execute(
+                    "UPDATE jobs SET status = 'failed', message = ?, lease_expires = NULL "
+                    "WHERE run_id = ? AND status IN ('pending', 'leased')",
+                    (f"not finished within {timeout:g}s", run_id)))
+                counts = self.counts(run_id)
+                if progress:
+                    progress(counts)
+                return counts
+            time.sleep(poll)
+
+    def finish_run(self, run_id, remove_files=True):
+        """Drops the run's jobs (and its directory) once the coordinator has merged the results."""
+        run = self.run_info(run_id)
+
+        def drop(db):
+            db.execute("DELETE FROM jobs WHERE run_id = ?", (run_id,))
+            db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        self._transaction(drop)
+        if remove_files and run:
+            shutil.rmtree(run["run_dir"], ignore_errors=True)
+
+    # --- workers ---
+    def lease(self, worker):
+        """
+        Claims the next pending job, or one whose lease has expired.
+        Returns the job row as a dict, or None when nothing is available.
+        """
+        now = time.time()
+
+        def claim(db):
+            self._reclaim(db, now)
+            # Oldest run first, then the coordinator's order within the run
+            row = db.execute(
+                "SELECT j.* FROM jobs j JOIN runs r ON r.run_id = j.run_id "
+                "WHERE j.status = 'pending' ORDER BY r.created_at, j.seq LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE run_id = ? AND sku_id = ?", (worker, now + self.lease_seconds, row["run_id"], row["sku_id"]))
+            return dict(row, worker=worker, attempts=row["attempts"] + 1)
+        return self._transaction(claim)
+
+    def renew(self, job, worker):
+        """Extends a lease; False if the job is no longer ours (expired and re-leased)."""
+        def extend(db):
+            return db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE run_id = ? AND sku_id = ? AND worker = ? "
+                "AND status = 'leased'",
+                (time.time() + self.lease_seconds, job["run_id"], job["sku_id"], worker)).rowcount == 1
+        return self._transaction(extend)
+
+    def complete(self, job, worker, result_path=None, message="", failed=False):
+        """Marks a leased job done (or failed). False if another worker owns it by now."""
+        def finish(db):
+            return db.execute(
+                "UPDATE jobs SET status = ?, result_path = ?, message = ?, lease_expires = NULL "
+                "WHERE run_id = ? AND sku_id = ? AND worker = ? AND status = 'leased'",
+                ("failed" if failed else "done", str(result_path) if result_path else None, message,
+                 job["run_id"], job["sku_id"], worker)).rowcount == 1
+        return self._transaction(finish)
+
+
+class _Heartbeat:
+    """Renews a job's lease every lease/3 seconds while the job runs."""
+
+    def __init__(self, queue, job, worker):
+        self.queue, self.job, self.worker = queue, job, worker
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            try:
+                if not self.queue.renew(self.job, self.worker):
+                    return
+            except sqlite3.Error:
+                # Transient lock/IO error: try again on the next beat
+                pass
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_worker(queue_path, handler=None, worker=None, idle_exit=IDLE_EXIT_SECONDS, max_jobs=None,
+               lease_seconds=LEASE_SECONDS):
+    """
+    Worker loop: lease a job, run `handler(job, run)` with the lease kept
+    alive, write its result dict under the run directory and mark the job
+    done. `handler` defaults to train_models.run_queue_job. Exits after
+    `idle_exit` seconds without work (or after `max_jobs`), but not while
+    a run it worked on still has leased jobs: if their worker crashed, the
+    job comes back once the lease expires. Returns the number of jobs completed.
+    """
+    if handler is None:
+        from train_models import run_queue_job as handler
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+    worker = worker or worker_name()
+    done, idle_since = 0, time.time()
+    runs = {}
+    while max_jobs is None or done < max_jobs:
+        job = queue.lease(worker)
+        if job is None:
+            if time.time() - idle_since > idle_exit and not any(
+                    queue.counts(run_id).get("leased") for run_id in runs):
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+        if job["run_id"] not in runs:
+            runs[job["run_id"]] = queue.run_info(job["run_id"])
+        run = runs[job["run_id"]]
+        try:
+            with _Heartbeat(queue, job, worker):
+                result = handler(job, run)
+            path = Path(run["run_dir"]) / "results" / f"{job['seq']}.{uuid.uuid4().hex[:6]}.joblib"
+            tmp = path.with_name(path.name + ".tmp")
+            joblib.dump(result, tmp)
+            os.replace(tmp, path)
+            queue.complete(job, worker, path, result.get("message", "") if isinstance(result, dict) else "")
+        except Exception as e:
+            queue.complete(job, worker, message=f"Failed: {e}", failed=True)
+        done += 1
+        idle_since = time.time()
+    return done
+
+
+def main():
+    """python src/job_queue.py <queue.db> - run one worker against a shared queue."""
+    if len(sys.argv) < 2:
+        print("usage: python src/job_queue.py <queue.db>")
+        return
+    worker = worker_name()
+    print(f"Worker {worker} on {sys.argv[1]} (exits after {IDLE_EXIT_SECONDS:.0f}s idle)")
+    n = run_worker(sys.argv[1], worker=worker)
+    print(f"Worker {worker}: {n} jobs processed")
+
+
+if __name__ == "__main__":
+    main()
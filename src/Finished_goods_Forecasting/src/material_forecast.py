@@ -0,0 +1,169 @@
+import pandas as pd
+import numpy as np
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from data_loader import load_table
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+CHATBOT_DB = Path(os.getenv("CHATBOT_DB", BASE_DIR.parent / "Text2SQL_V2" / "chatbot.db"))
+# Generated copy of the table. The chatbot (Text2SQL_V2) rebuilds its tables
+# from src/data CSVs at start-up and the dashboard reads the same file; point
+# this at src/data/inventory-forecast.csv to replace the shipped table there too
+OUTPUT_CSV = Path(os.getenv("MATERIAL_FORECAST_CSV", BASE_DIR / "inventory_forecast.csv"))
+# Shipped table, read only: names of materials raw_material_inventory.csv does not cover
+CHATBOT_CSV = BASE_DIR.parent / "data" / "inventory-forecast.csv"
+TABLE_NAME = "inventory_forecast"
+# Days of recent deliveries behind implied_daily_avg
+IMPLIED_WINDOW_DAYS = int(os.getenv("MATERIAL_IMPLIED_DAYS", 30))
+# Reference date (YYYY-MM-DD); unset = the last recorded delivery
+FORECAST_DATE = os.getenv("MATERIAL_FORECAST_DATE", "")
+# Fixed by the table schema (schema_metadata.json)
+TABLE_HORIZONS = [7, 14, 30]
+ALERT_LEVELS = ["CRITICAL", "WARNING", "ALERT"]
+# Materials without a stock count: no balance, and no alert either
+UNKNOWN_STOCK = "UNKNOWN STOCK"
+COLUMNS = (["material_id", "date", "implied_daily_avg", "historical_daily_avg", "deviation_ratio"]
+           + [f"forecast_{h}d_kg" for h in TABLE_HORIZONS] + ["material_name", "current_stock_kg"]
+           + [f"balance_{h}d" for h in TABLE_HORIZONS] + ["status"])
+
+
+def daily_deliveries(po_df, end):
+    """
+    Delivered kg per material per day up to `end`, as one dense
+    materials x days array built with a single bincount.
+    Returns (material ids, first day, array).
+    """
+    delivered = po_df.dropna(subset=["actual_delivery_date", "quantity_kg"])
+    delivered = delivered[delivered["actual_delivery_date"] <= end]
+    materials = pd.Index(sorted(delivered["material_id"].astype(str).unique()))
+    if delivered.empty:
+        return materials, end, np.zeros((0, 1))
+    start = delivered["actual_delivery_date"].min()
+    n_days = (end - start).days + 1
+    codes = materials.get_indexer(delivered["material_id"].astype(str))
+    day = (delivered["actual_delivery_date"] - start).dt.days.to_numpy()
+    daily = np.bincount(codes * n_days + day, weights=delivered["quantity_kg"].to_numpy(dtype=np.float64),
+                        minlength=len(materials) * n_days).reshape(len(materials), n_days)
+    return materials, start, daily
+
+
+def _stock_and_names(material_ids, rm, names_csv=CHATBOT_CSV):
+    """
+    current_stock_kg and material_name per material, from the
+    raw_material_inventory table `rm`. Materials it does not cover have
+    unknown stock (NaN); their names fall back to `names_csv`.
+    """
+    stock = pd.Series(np.nan, index=material_ids)
+    names = pd.Series(None, index=material_ids, dtype=object)
+    if not rm.empty:
+        rm = rm.assign(material_id=rm["material_id"].astype(str)).drop_duplicates("material_id", keep="last")
+        rm = rm.set_index("material_id")
+        stock = stock.fillna(rm["current_stock_kg"].reindex(material_ids))
+        if "material_name" in rm.columns:
+            names = names.fillna(rm["material_name"].astype(object).reindex(material_ids))
+    if names_csv and Path(names_csv).exists():
+        prev = pd.read_csv(names_csv).drop_duplicates("material_id", keep="last").set_index("material_id")
+        if "material_name" in prev.columns:
+            names = names.fillna(prev["material_name"].reindex(material_ids))
+    return stock.to_numpy(dtype=np.float64), names.astype(object).where(names.notna(), None).to_numpy()
+
+
+def material_forecast(po_df, rm_df, as_of=None, window=IMPLIED_WINDOW_DAYS, names_csv=CHATBOT_CSV):
+    """
+    The inventory_forecast table for every material with delivery history,
+    with stock from `rm_df` (raw_material_inventory):
+
+    - historical_daily_avg: delivered kg per day from the first delivery to the reference date
+    - implied_daily_avg:    delivered kg per day over the last `window` days
+    - deviation_ratio:      implied / historical
+    - forecast_<h>d_kg:     implied_daily_avg x h
+    - balance_<h>d:         current_stock_kg - forecast_<h>d_kg
+    - status:               first horizon whose balance is negative
+                            (CRITICAL 7d, WARNING 14d, ALERT 30d), else OK;
+                            UNKNOWN STOCK (NULL stock and balances) without a stock count
+    """
+    end = pd.Timestamp(as_of) if as_of else po_df["actual_delivery_date"].max()
+    materials, start, daily = daily_deliveries(po_df, end)
+
+    delivered = daily > 0
+    first = np.where(delivered.any(axis=1), delivered.argmax(axis=1), daily.shape[1])
+    span = np.maximum(daily.shape[1] - first, 1)
+    historical = daily.sum(axis=1) / span
+    implied = daily[:, -window:].sum(axis=1) / window
+    deviation = np.divide(implied, historical, out=np.zeros(len(materials)), where=historical > 0)
+
+    stock, names = _stock_and_names(materials, rm_df, names_csv)
+    forecast = np.round(implied[:, None] * np.asarray(TABLE_HORIZONS)[None, :])
+    balance = np.round(stock[:, None] - forecast, 2)
+
+    conditions = [balance[:, j] < 0 for j in range(len(TABLE_HORIZONS))]
+    labels = [f"{level}: Stockout in {h}d" for level, h in zip(ALERT_LEVELS, TABLE_HORIZONS)]
+
+    out = {"material_id": materials.to_numpy(dtype=object), "date": end.strftime("%d-%m-%Y"),
+           "implied_daily_avg": np.round(implied, 5), "historical_daily_avg": np.round(historical),
+           "deviation_ratio": np.round(deviation, 9)}
+    for j, h in enumerate(TABLE_HORIZONS):
+        out[f"forecast_{h}d_kg"] = forecast[:, j].astype(np.int64)
+    out["material_name"] = names
+    out["current_stock_kg"] = stock
+    for j, h in enumerate(TABLE_HORIZONS):
+        out[f"balance_{h}d"] = balance[:, j]
+    out["status"] = np.select([np.isnan(stock)] + conditions, [UNKNOWN_STOCK] + labels, default="OK")
+    return pd.DataFrame(out)[COLUMNS].sort_values(f"balance_{TABLE_HORIZONS[0]}d", ignore_index=True)
+
+
+def publish(df, db_path=CHATBOT_DB, csv_path=OUTPUT_CSV):
+    """Replaces the chatbot's inventory_forecast table and writes the table to `csv_path`."""
+    csv_path = Path(csv_path)
+    tmp = csv_path.with_name(csv_path.name + ".tmp")
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, csv_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            df.to_sql(TABLE_NAME, conn, if_exists="replace", index=False)
+    finally:
+        conn.close()
+
+
+def run_once():
+    """One refresh; None (nothing published) when an input is missing."""
+    po = load_table("purchase_orders")
+    if po.empty:
+        print("Error: purchase_orders.csv missing.")
+        return None
+    rm = load_table("raw_material_inventory")
+    if rm.empty:
+        # Without stock every row would be UNKNOWN STOCK; keep the current table instead
+        print("Error: raw_material_inventory.csv missing (material_id, current_stock_kg[, material_name]); "
+              "nothing published.")
+        return None
+    start = time.time()
+    df = material_forecast(po, rm, FORECAST_DATE or None)
+    publish(df)
+    print(f"{len(df)} materials as of {df['date'].iat[0] if len(df) else '-'} in {time.time() - start:.2f}s: "
+          + ", ".join(f"{k} {v}" for k, v in df["status"].str.split(":").str[0].value_counts().items()))
+    return df
+
+
+def main():
+    """python src/material_forecast.py [--every SECONDS] - one refresh, or one every SECONDS."""
+    print("="*60 + "\n   RAW-MATERIAL FORECAST (inventory_forecast)\n" + "="*60)
+    every = float(sys.argv[sys.argv.index("--every") + 1]) if "--every" in sys.argv else 0
+    while True:
+        published = run_once() is not None
+        if published:
+            print(f"✓ {TABLE_NAME} written to: {CHATBOT_DB} and {OUTPUT_CSV}")
+        if not every:
+            return 0 if published else 1
+        time.sleep(every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
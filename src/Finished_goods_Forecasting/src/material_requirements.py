@@ -0,0 +1,119 @@
+import pandas as pd
+import numpy as np
+import time
+from pathlib import Path
+from scipy import sparse
+
+from data_loader import load_table
+from forecast_curves import CURVES_PATH, ForecastCurves, load_curves
+from run_forecast import HORIZONS, compute_incoming_supply
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+REQUIREMENTS_JSON = BASE_DIR / "material_requirements.json"
+# Daily cumulative requirement / incoming PO curves per material (ForecastCurves layout)
+MATERIAL_CURVES_PATH = BASE_DIR / "material_curves.npz"
+
+
+def bom_matrix(bom_df, sku_ids, material_ids):
+    """
+    Sparse SKU x material matrix of kg per unit (CSR). BOM rows for SKUs or
+    materials outside the given lists are dropped; duplicate rows add up.
+    """
+    sku_codes = pd.Index(sku_ids).get_indexer(bom_df["sku_id"].astype(str))
+    mat_codes = pd.Index(material_ids).get_indexer(bom_df["material_id"].astype(str))
+    keep = (sku_codes >= 0) & (mat_codes >= 0)
+    return sparse.csr_matrix((bom_df["kg_per_unit"].to_numpy(dtype=np.float64)[keep],
+                              (sku_codes[keep], mat_codes[keep])),
+                             shape=(len(sku_ids), len(material_ids)))
+
+
+def open_purchase_orders(po_df, origin):
+    """
+    Undelivered, uncancelled POs as supply events keyed like run_forecast's
+    (sku_id = material_id, standard_date = expected delivery, overdue ones due at the origin).
+    """
+    if po_df.empty or "actual_delivery_date" not in po_df.columns:
+        return pd.DataFrame(columns=["sku_id", "standard_date", "quantity_kg"])
+    open_po = po_df[po_df["actual_delivery_date"].isna()]
+    if "status" in open_po.columns:
+        open_po = open_po[open_po["status"].astype(str).str.lower() != "cancelled"]
+    due = open_po["expected_delivery_date"].fillna(pd.Timestamp(origin)).clip(lower=pd.Timestamp(origin))
+    return pd.DataFrame({"sku_id": open_po["material_id"].astype(str), "standard_date": due,
+                         "quantity_kg": open_po["quantity_kg"]})
+
+
+def explode_requirements(curves, bom_df, material_stock, po_df):
+    """
+    MRP explosion of a forecast run: daily SKU demand (from the run's
+    curves) times the sparse BOM gives daily kg per material in one
+    product, netted against material stock and open POs.
+    `material_stock` is a Series of kg indexed by material_id.
+    Returns ForecastCurves over materials (demand = requirements, supply = open POs).
+    """
+    material_ids = pd.Index(sorted(set(bom_df["material_id"].astype(str)) | set(material_stock.index.astype(str))))
+    bom = bom_matrix(bom_df, list(curves.sku_ids), material_ids)
+    daily_demand = np.diff(curves.cum_demand, axis=1, prepend=0.0)
+
+    # (materials x SKUs) @ (SKUs x days) -> kg per material per day
+    required = np.asarray(bom.T @ daily_demand)
+
+    stock = material_stock.reindex(material_ids, fill_value=0).to_numpy(dtype=np.float64)
+    incoming = compute_incoming_supply(material_ids, np.arange(1, curves.n_days + 1), pd.DataFrame(),
+                                       open_purchase_orders(po_df, curves.origin), curves.origin.to_pydatetime())
+    return ForecastCurves(material_ids, curves.origin, stock, np.cumsum(required, axis=1), incoming)
+
+
+def requirements_frame(material_curves, horizons=HORIZONS, names=None):
+    """Per material and horizon: kg required, kg arriving on open POs, balance and net requirement."""
+    horizons = sorted(set(horizons))
+    df = material_curves.to_frame(horizons).rename(columns={"sku_id": "material_id"})
+    df = df.rename(columns=lambda c: c.replace("forecast_", "required_").replace("supply_", "incoming_")
+                   .replace("stockout_date", "shortage_date"))
+    df.insert(1, "current_stock_kg", material_curves.stock)
+    if names is not None:
+        df.insert(1, "material_name", names.reindex(df["material_id"]).to_numpy())
+    for h in horizons:
+        df[f"net_requirement_{h}d"] = np.maximum(-df[f"balance_{h}d"], 0)
+    return df
+
+
+def main():
+    print("="*60 + "\n   MATERIAL REQUIREMENTS (BOM EXPLOSION)\n" + "="*60)
+    curves = load_curves(CURVES_PATH)
+    if curves is None:
+        print(f"No forecast curves at {CURVES_PATH}; run the forecaster first.")
+        return
+    bom = load_table("bill_of_materials")
+    if bom.empty:
+        print("No bill of materials (data/bill_of_materials.csv: sku_id, material_id, kg_per_unit).")
+        return
+    rm = load_table("raw_material_inventory")
+    stock, names = pd.Series(dtype=float), None
+    if not rm.empty:
+        rm = rm.assign(material_id=rm["material_id"].astype(str))
+        stock = rm.groupby("material_id")["current_stock_kg"].sum()
+        if "material_name" in rm.columns:
+            names = rm.drop_duplicates("material_id").set_index("material_id")["material_name"]
+
+    start = time.time()
+    materials = explode_requirements(curves, bom, stock, load_table("purchase_orders"))
+    print(f"Exploded {len(curves.sku_ids)} SKUs into {len(materials.sku_ids)} materials "
+          f"x {materials.n_days} days in {time.time() - start:.3f}s")
+    materials.save(MATERIAL_CURVES_PATH)
+
+    horizons = [h for h in sorted(set(HORIZONS)) if h <= materials.n_days]
+    df = requirements_frame(materials, horizons, names).sort_values(f"balance_{horizons[-1]}d")
+    cols = ["material_id", "current_stock_kg", f"required_{horizons[-1]}d", f"incoming_{horizons[-1]}d",
+            f"balance_{horizons[-1]}d", "shortage_date"]
+    try:
+        print(df[cols].head(15).to_markdown(index=False, floatfmt=".1f"))
+    except ImportError:
+        print(df[cols].head(15).to_string(index=False))
+    df.to_json(REQUIREMENTS_JSON, orient='records', indent=4)
+    print(f"\n✓ Requirements saved to: {REQUIREMENTS_JSON}")
+    print(f"✓ Daily requirement curves saved to: {MATERIAL_CURVES_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import joblib
+import json
+import os
+import re
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from compact_arima import export_compact, load_compact, save_compact
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = BASE_DIR / "models"
+STORE_PATH = MODEL_PATH / "store"
+LEGACY_MODELS = MODEL_PATH / "all_models.joblib"
+LEGACY_META = MODEL_PATH / "model_meta.json"
+# Loaded models kept in memory per store instance
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", 64))
+
+
+def _safe_name(sku_id):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(sku_id))
+
+
+def _new_version():
+    return datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def _atomic_dump_json(obj, path):
+    tmp = path.with_name(path.name + f".{uuid.uuid4().hex[:6]}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+class ModelStore:
+    """
+    One artifact per SKU plus a small index.json:
+
+        {"skus": {sku_id: {"file": ..., "compact": ..., "version": ..., "meta": {...}}}}
+
+    "compact" is an optional .npz CompactARIMA export next to the pickled
+    model; forecasting reads it through get_predictor() without unpickling.
+    Models are loaded lazily and kept in an LRU of `cache_size` entries.
+    `put`/`put_many` write the new artifact under a fresh versioned name and
+    then swap the index atomically, so readers never see a half-written model
+    and a partial retrain only touches the SKUs it retrained.
+    The index is read-modify-write: publish from one process at a time.
+    """
+
+    def __init__(self, root=STORE_PATH, cache_size=MODEL_CACHE_SIZE):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._index = self._read_index()
+
+    def _read_index(self):
+        if not self.index_path.exists():
+            return {"skus": {}}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def reload(self):
+        """Re-reads the index; cached models whose version changed are dropped."""
+        self._index = self._read_index()
+        for key in list(self._cache):
+            if self.version(key[0]) != self._cache[key][0]:
+                del self._cache[key]
+
+    def exists(self):
+        return self.index_path.exists()
+
+    # --- index access (no model loading) ---
+    def skus(self):
+        return list(self._index["skus"])
+
+    def __contains__(self, sku_id):
+        return sku_id in self._index["skus"]
+
+    def __len__(self):
+        return len(self._index["skus"])
+
+    def version(self, sku_id):
+        entry = self._index["skus"].get(sku_id)
+        return entry["version"] if entry else None
+
+    def meta(self, sku_id):
+        entry = self._index["skus"].get(sku_id)
+        return dict(entry.get("meta", {})) if entry else {}
+
+    def all_meta(self):
+        return {sku: dict(e.get("meta", {})) for sku, e in self._index["skus"].items()}
+
+    def path(self, sku_id):
+        return self.root / self._index["skus"][sku_id]["file"]
+
+    def artifact_sizes(self, sku_id):
+        """(pickled model bytes, compact export bytes or None) for one SKU."""
+        entry = self._index["skus"][sku_id]
+        compact = entry.get("compact")
+        return ((self.root / entry["file"]).stat().st_size,
+                (self.root / compact).stat().st_size if compact else None)
+
+    # --- models ---
+    def _cached(self, sku_id, kind, load):
+        version = self._index["skus"][sku_id]["version"]
+        key = (sku_id, kind)
+        hit = self._cache.get(key)
+        if hit is not None and hit[0] == version:
+            self._cache.move_to_end(key)
+            return hit[1]
+        obj = load()
+        self._remember(key, version, obj)
+        return obj
+
+    def _remember(self, key, version, obj):
+        self._cache[key] = (version, obj)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, sku_id):
+        """Loads one SKU's full model (LRU-cached). KeyError if the SKU is not stored."""
+        return self._cached(sku_id, "model", lambda: joblib.load(self.path(sku_id)))
+
+    def get_predictor(self, sku_id):
+        """
+        Cheapest object with a pmdarima-style predict(): the CompactARIMA
+        export when there is one, otherwise the full model.
+        """
+        compact = self._index["skus"][sku_id].get("compact")
+        if not compact:
+            return self.get(sku_id)
+        return self._cached(sku_id, "compact", lambda: load_compact(self.root / compact))
+
+    def _write_model(self, sku_id, model):
+        version = _new_version()
+        name = f"{_safe_name(sku_id)}.{version}.joblib"
+        tmp = self.root / (name + ".tmp")
+        joblib.dump(model, tmp)
+        os.replace(tmp, self.root / name)
+        try:
+            compact = f"{_safe_name(sku_id)}.{version}.npz"
+            save_compact(export_compact(model), self.root / compact)
+        except Exception:
+            # Not an exportable ARIMA; forecasts use the pickled model
+            compact = None
+        return name, compact, version
+
+    def put(self, sku_id, model, meta=None):
+        self.put_many({sku_id: model}, {sku_id: meta or {}})
+
+    def put_many(self, models, meta=None, remove=()):
+        """
+        Publishes several SKUs with one index swap. `meta` may also carry
+        entries for SKUs not in `models` (metadata-only update).
+        Returns {sku_id: version} for the models written.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        meta = meta or {}
+        # Pick up publishes made since this instance was opened
+        index = self._read_index()
+        stale_files = []
+        versions = {}
+        for sku_id, model in models.items():
+            name, compact, version = self._write_model(sku_id, model)
+            old = index["skus"].get(sku_id)
+            if old:
+                stale_files += [f for f in (old["file"], old.get("compact")) if f]
+            index["skus"][sku_id] = {"file": name, "compact": compact, "version": version,
+                                     "meta": meta.get(sku_id, old.get("meta", {}) if old else {})}
+            versions[sku_id] = version
+            self._remember((sku_id, "model"), version, model)
+        for sku_id, m in meta.items():
+            if sku_id not in models and sku_id in index["skus"]:
+                index["skus"][sku_id]["meta"] = m
+        for sku_id in remove:
+            old = index["skus"].pop(sku_id, None)
+            if old:
+                stale_files += [f for f in (old["file"], old.get("compact")) if f]
+            for kind in ("model", "compact"):
+                self._cache.pop((sku_id, kind), None)
+
+        index["skus"] = dict(sorted(index["skus"].items()))
+        index["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        _atomic_dump_json(index, self.index_path)
+        self._index = index
+
+        for name in stale_files:
+            try:
+                os.remove(self.root / name)
+            except FileNotFoundError:
+                pass
+        return versions
+
+    def remove(self, sku_ids):
+        self.put_many({}, remove=sku_ids)
+
+
+def open_store(root=STORE_PATH):
+    """
+    Opens the per-SKU store. A legacy all_models.joblib (+ model_meta.json)
+    is imported once when no store exists yet.
+    """
+    store = ModelStore(root)
+    if not store.exists() and LEGACY_MODELS.exists():
+        try:
+            models = joblib.load(LEGACY_MODELS)
+        except Exception as e:
+            print(f"Could not import legacy {LEGACY_MODELS.name}: {e}")
+            return store
+        meta = {}
+        if LEGACY_META.exists():
+            with open(LEGACY_META) as f:
+                meta = json.load(f)
+        print(f"Importing {len(models)} models from {LEGACY_MODELS.name} into {root}...")
+        store.put_many(models, meta)
+    return store
@@ -0,0 +1,112 @@
+import pandas as pd
+import numpy as np
+import os
+from pathlib import Path
+
+from data_loader import iter_table
+from fallback_forecast import fallback_forecasts
+from sales_matrix import CACHE_PATH, get_sales_matrix, load_sales_matrix
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = BASE_DIR / "data"
+SALES_CSV = DATA_PATH / "sales_history.csv"
+REGIONS_JSON = BASE_DIR / "forecast_regions.json"
+REGION_MATRIX_FILE = CACHE_PATH / "region_matrix.npy"
+REGION_INDEX_FILE = CACHE_PATH / "region_matrix.json"
+# "1" adds a SKU x region breakdown to every forecast run
+REGION_FORECASTS = os.getenv("FORECAST_REGIONS", "0") == "1"
+# Base forecaster for the regional series: any fallback_forecast method, or "auto"
+REGION_METHOD = os.getenv("REGION_METHOD", "auto")
+# Days of regional history used to split a SKU whose regional forecasts are all zero
+SHARE_DAYS = int(os.getenv("REGION_SHARE_DAYS", 56))
+# Matrix rows are keyed "<sku_id>|<region>"
+KEY_SEP = "|"
+UNKNOWN_REGION = "UNKNOWN"
+
+
+def _region_chunks(chunks):
+    """Sales chunks re-keyed to SKU x region, pre-aggregated per day."""
+    for chunk in chunks:
+        daily = (chunk.assign(region=chunk["region"].astype(object).fillna(UNKNOWN_REGION))
+                 .groupby(["sku_id", "region", "date"], observed=True)["quantity_sold"].sum()
+                 .reset_index())
+        keys = daily["sku_id"].astype(str) + KEY_SEP + daily["region"].astype(str)
+        yield pd.DataFrame({"sku_id": keys, "date": daily["date"], "quantity_sold": daily["quantity_sold"]})
+
+
+def get_region_matrix():
+    """SKU x region x day sales as a SalesMatrix (rows "<sku>|<region>"); None without history."""
+    if SALES_CSV.exists():
+        return get_sales_matrix(lambda: _region_chunks(iter_table("sales_history")), SALES_CSV,
+                                REGION_MATRIX_FILE, REGION_INDEX_FILE)
+    return load_sales_matrix(matrix_file=REGION_MATRIX_FILE, index_file=REGION_INDEX_FILE)
+
+
+def split_keys(keys):
+    """["SKU-1|North", ...] -> (array of sku_ids, array of regions)."""
+    parts = pd.Series(keys, dtype=object).str.split(KEY_SEP, n=1, expand=True)
+    return parts[0].to_numpy(dtype=object), parts[1].to_numpy(dtype=object)
+
+
+def reconcile(sku_ids, sku_demand, matrix, method=REGION_METHOD):
+    """
+    Splits each SKU's daily demand over its regions.
+
+    Every regional series gets a base forecast in one batched
+    fallback_forecasts pass (no per-series models), and each day's SKU
+    demand is then shared out in proportion to those base forecasts, so the
+    regions always add up to the SKU total. SKUs whose regional forecasts
+    are all zero are split by their last SHARE_DAYS of regional sales, or
+    evenly. SKUs with no regional history are left out.
+
+    sku_demand: array of shape (len(sku_ids), n_days).
+    Returns (row in sku_ids, region, demand (n_rows x n_days), base method) per SKU x region row.
+    """
+    sku_demand = np.asarray(sku_demand, dtype=np.float64)
+    n_sku, n_days = sku_demand.shape
+    skus, regions = split_keys(matrix.skus)
+    codes = pd.Index(sku_ids).get_indexer(skus)
+    rows = np.flatnonzero(codes >= 0)
+    codes, regions = codes[rows], regions[rows]
+
+    base, methods = fallback_forecasts(matrix, [matrix.skus[r] for r in rows], n_days, method)
+    total = np.zeros((n_sku, n_days))
+    np.add.at(total, codes, base)
+
+    recent = np.asarray(matrix.values[rows, -SHARE_DAYS:], dtype=np.float64).sum(axis=1)
+    recent_total = np.bincount(codes, weights=recent, minlength=n_sku)[codes]
+    n_regions = np.bincount(codes, minlength=n_sku)[codes]
+    static = np.divide(recent, recent_total, out=1.0 / np.maximum(n_regions, 1), where=recent_total > 0)
+
+    share = np.repeat(static[:, None], n_days, axis=1)
+    np.divide(base, total[codes], out=share, where=total[codes] > 0)
+    return codes, regions, share * sku_demand[codes], methods
+
+
+def region_frame(curves, matrix, horizons, method=REGION_METHOD):
+    """
+    SKU x region rows for a forecast run's curves (see forecast_curves):
+    regional demand per horizon, the region's share of the SKU's demand,
+    and its share of the SKU's shortfall (unmet_<h>d), i.e. where a
+    stockout lands.
+    """
+    horizons = sorted(set(horizons))
+    daily = np.diff(curves.cum_demand, axis=1, prepend=0.0)
+    codes, regions, demand, methods = reconcile(curves.sku_ids, daily, matrix, method)
+
+    cum = np.cumsum(demand, axis=1)[:, np.asarray(horizons) - 1]
+    sku_cum = curves.demand_at(horizons)[codes]
+    share = np.divide(cum, sku_cum, out=np.zeros_like(cum), where=sku_cum > 0)
+    shortfall = np.maximum(-curves.balance_at(horizons), 0)[codes]
+
+    out = {"sku_id": curves.sku_ids[codes], "region": regions}
+    for j, h in enumerate(horizons):
+        out[f"forecast_{h}d"] = np.round(cum[:, j], 1)
+    for j, h in enumerate(horizons):
+        out[f"share_{h}d"] = np.round(share[:, j], 4)
+    for j, h in enumerate(horizons):
+        out[f"unmet_{h}d"] = np.round(share[:, j] * shortfall[:, j], 1)
+    out["base_method"] = methods
+    out["stockout_date"] = curves.stockout_date()[codes]
+    return pd.DataFrame(out)
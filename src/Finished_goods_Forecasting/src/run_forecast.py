@@ -1,133 +1,462 @@
 import pandas as pd
 import numpy as np
-import joblib
+import json
 import os
+import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from data_loader import load_table
+from fallback_forecast import FALLBACK_METHOD, fallback_forecasts
+from forecast_cache import forecast_origin, load_forecast_cache
+from model_store import open_store
+from region_forecast import REGION_FORECASTS, REGIONS_JSON, get_region_matrix, region_frame
+from forecast_curves import ForecastCurves, alert_status, load_curves, CURVES_PATH
+from sales_matrix import sales_history_matrix
 
 # --- CONFIGURATION ---
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_PATH = BASE_DIR / "data"
 MODEL_PATH = BASE_DIR / "models"
 OUTPUT_JSON = BASE_DIR / "forecast_results.json"
+# Per-SKU input hashes of the last run (see refresh_forecasts)
+FINGERPRINTS_JSON = BASE_DIR / "forecast_fingerprints.json"
+SALES_CSV = DATA_PATH / "sales_history.csv"
+# Reporting horizons in days; the daily curves run out to the longest one
+HORIZONS = [int(h) for h in os.getenv("FORECAST_HORIZONS", "7,14,30").split(",")]
+# Partitioned output of backfill(), one as_of=YYYY-MM-DD directory per date
+BACKFILL_DIR = BASE_DIR / "forecast_backfill"
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", os.cpu_count() or 1))
+# Recompute only SKUs whose inputs changed since the last run (0 = always recompute all)
+INCREMENTAL = os.getenv("FORECAST_INCREMENTAL", "1") == "1"
 warnings.filterwarnings("ignore")
 
-def load_csv(filename):
-    path = DATA_PATH / filename
-    if not path.exists():
-        return pd.DataFrame()
-    df = pd.read_csv(path)
-    df.columns = [c.lower().strip() for c in df.columns]
-    date_col = next((col for col in df.columns if 'date' in col or 'delivery' in col), None)
-    if date_col:
-        df['standard_date'] = pd.to_datetime(df[date_col])
-    return df
-
-def get_incoming_supply(sku_id, days_horizon, prod_df, po_df):
-    total = 0.0
-    cutoff = datetime.now() + timedelta(days=days_horizon)
+# Text columns of a report row; every other column is a float
+STRING_COLUMNS = ["sku_id", "status", "forecast_method", "stockout_date"]
+
+try:
+    import pyarrow as pa
+    BACKFILL_FORMAT = "parquet"
+except ImportError:
+    pa = None
+    BACKFILL_FORMAT = "csv"
+
+def _supply_events(prod_df, po_df):
+    """Stacks every supply source that is keyed by sku_id into (sku_id, standard_date, qty)."""
+    frames = []
     for df in [prod_df, po_df]:
         if not df.empty and 'sku_id' in df.columns and 'standard_date' in df.columns:
             qty_col = next((c for c in df.columns if 'quantity' in c or 'qty' in c), None)
             if qty_col:
-                mask = (df['sku_id'] == sku_id) & (df['standard_date'] <= cutoff) & (df['standard_date'] >= datetime.now())
-                total += df.loc[mask, qty_col].sum()
-    return total
+                frames.append(df[['sku_id', 'standard_date', qty_col]].set_axis(['sku_id', 'standard_date', 'qty'], axis=1))
+    if not frames:
+        return pd.DataFrame(columns=['sku_id', 'standard_date', 'qty'])
+    return pd.concat(frames, ignore_index=True)
 
-def generate_forecasts(inventory_df, prod_df, po_df):
-    results = []
-    
-    # Load Dict
-    dict_path = MODEL_PATH / "all_models.joblib"
-    models_dict = joblib.load(dict_path) if dict_path.exists() else {}
-
-    print(f"Generating forecasts for {len(inventory_df)} items...\n")
-
-    for _, row in inventory_df.iterrows():
-        sku_id = row["sku_id"]
-        # Prefer explicit current_stock column; fall back to current_stock_units or quantity if needed
-        current_stock = float(
-            row.get(
-                "current_stock",
-                row.get("current_stock_units", row.get("quantity", 0)),
-            )
-        )
-
-        item_res = {
-            "sku_id": sku_id,
-            "current_stock": current_stock,
-            "forecast_30d": 0,
-            "supply_30d": 0,
-            "balance_30d": 0,
-            "status": "No Model"
-        }
-
-        # 1. FORECAST
-        f_7, f_14, f_30 = 0, 0, 0
-        if sku_id in models_dict:
+def compute_incoming_supply(sku_ids, horizons, prod_df, po_df, now=None):
+    """
+    Incoming supply for every SKU and every horizon in one pass.
+    Returns an array of shape (len(sku_ids), len(horizons)) where cell [i, j]
+    is the quantity arriving in [now, now + horizons[j] days] for sku_ids[i].
+    """
+    now = now or datetime.now()
+    sku_ids = pd.Index(sku_ids)
+    horizons = np.asarray(horizons, dtype=float)
+    out = np.zeros((len(sku_ids), len(horizons)))
+
+    events = _supply_events(prod_df, po_df)
+    if events.empty or len(sku_ids) == 0:
+        return out
+
+    # Offset in (fractional) days from `now`; keep the window [0, max horizon]
+    offset = (events['standard_date'] - now) / pd.Timedelta(days=1)
+    codes = sku_ids.get_indexer(events['sku_id'])
+    keep = (codes >= 0) & (offset >= 0) & (offset <= horizons.max())
+    if not keep.any():
+        return out
+    codes, offset, qty = codes[keep], offset[keep].to_numpy(), events['qty'][keep].to_numpy(dtype=float)
+
+    # Sort on a composite (sku, offset) key so each SKU owns the band
+    # [code * span, code * span + max horizon]; cumulative sums + searchsorted
+    # then give the running total at any cutoff.
+    span = horizons.max() + 1
+    key = codes * span + offset
+    order = np.argsort(key, kind='stable')
+    key, csum = key[order], np.concatenate([[0.0], np.cumsum(qty[order])])
+
+    base = np.arange(len(sku_ids))[:, None] * span
+    start = np.searchsorted(key, base, side='left')
+    end = np.searchsorted(key, base + horizons[None, :], side='right')
+    return csum[end] - csum[start]
+
+def _current_stock(inventory_df):
+    # Prefer explicit current_stock column; fall back to current_stock_units or quantity if needed
+    for col in ["current_stock", "current_stock_units", "quantity"]:
+        if col in inventory_df.columns:
+            return inventory_df[col].astype(float).to_numpy()
+    return np.zeros(len(inventory_df))
+
+def _build_curves(inventory_df, prod_df, po_df, n_days, now, as_of=None):
+    """
+    (ForecastCurves, base status, forecast method) for the SKUs in inventory_df.
+    With `as_of`, demand starts that day: model paths skip the days between
+    the model's origin and as_of, models trained past as_of are not used,
+    and the fallback only sees history before as_of.
+    """
+    # Per-SKU model store; models are loaded lazily, only on a cache miss
+    store = open_store()
+    cache = load_forecast_cache()
+    sku_ids = inventory_df["sku_id"].tolist()
+    current_stock = _current_stock(inventory_df)
+
+    # 1. FORECAST (cached path from training; predict only on a miss)
+    daily_demand = np.zeros((len(sku_ids), n_days))
+    status = np.full(len(sku_ids), "No Model", dtype=object)
+    misses = 0
+    for i, sku_id in enumerate(sku_ids):
+        if sku_id in store:
+            origin = forecast_origin(store.meta(sku_id))
+            skip = 0
+            if as_of is not None:
+                skip = (pd.Timestamp(as_of).normalize() - pd.Timestamp(origin)).days if origin else -1
+                if skip < 0:
+                    # Trained on days after as_of: that model did not exist yet
+                    continue
+            hit = cache.lookup(sku_id, store.version(sku_id), origin, skip + n_days)
             try:
-                model = models_dict[sku_id]
-                # Predict 30 days
-                preds = np.maximum(model.predict(n_periods=30), 0)
-                f_7, f_14, f_30 = [np.sum(preds[:n]) for n in [7, 14, 30]]
-                item_res["status"] = "OK"
-            except:
-                item_res["status"] = "Model Error"
-        
-        # 2. SUPPLY
-        s_7 = get_incoming_supply(sku_id, 7, prod_df, po_df)
-        s_14 = get_incoming_supply(sku_id, 14, prod_df, po_df)
-        s_30 = get_incoming_supply(sku_id, 30, prod_df, po_df)
-
-        # 3. BALANCE
-        b_7 = current_stock - f_7 + s_7
-        b_14 = current_stock - f_14 + s_14
-        b_30 = current_stock - f_30 + s_30
-
-        item_res.update({
-            "forecast_7d": round(float(f_7), 1),
-            "forecast_14d": round(float(f_14), 1),
-            "forecast_30d": round(float(f_30), 1),
-            "supply_30d": round(float(s_30), 1),
-            "balance_7d": round(b_7, 1),
-            "balance_14d": round(b_14, 1),
-            "balance_30d": round(b_30, 1)
-        })
-
-        # 4. ALERT LOGIC
-        if item_res["status"] == "OK":
-            if b_7 < 0: item_res["status"] = "CRITICAL: Stockout < 7d"
-            elif b_14 < 0: item_res["status"] = "WARNING: Stockout < 14d"
-            elif b_30 < 0: item_res["status"] = "ALERT: Stockout < 30d"
-
-        results.append(item_res)
-
-    return pd.DataFrame(results)
+                if hit is None:
+                    misses += 1
+                    preds = store.get_predictor(sku_id).predict(n_periods=skip + n_days)
+                else:
+                    preds = hit[0]
+                daily_demand[i] = np.maximum(np.asarray(preds)[skip:], 0)
+                status[i] = "OK"
+            except Exception:
+                status[i] = "Model Error"
+    if misses:
+        print(f"Forecast cache misses: {misses} (predicted from the model store)\n")
+
+    # 1b. FALLBACK for SKUs with no model or a failing one (one NumPy pass)
+    method = np.where(status == "OK", "arima", "none").astype(object)
+    missing = np.flatnonzero(status != "OK")
+    if len(missing):
+        matrix = sales_history_matrix()
+        if matrix is not None and as_of is not None:
+            matrix = matrix.before(as_of)
+        demand, fb_method = fallback_forecasts(matrix, [sku_ids[i] for i in missing], n_days)
+        daily_demand[missing] = demand
+        method[missing] = fb_method
+        covered = missing[fb_method != "none"]
+        status[covered] = "OK"
+        print(f"Fallback forecasts: {len(covered)} of {len(missing)} SKUs without a usable model\n")
+
+    # 2. SUPPLY (cumulative arrivals for day 1..n_days, all SKUs at once)
+    cum_supply = compute_incoming_supply(sku_ids, np.arange(1, n_days + 1), prod_df, po_df, now)
+
+    curves = ForecastCurves(sku_ids, now, current_stock, np.cumsum(daily_demand, axis=1), cum_supply)
+    return curves, status, method
+
+def _frame(curves, horizons, status, method):
+    """Report rows from the curves: balances per horizon plus alert status."""
+    # 3. BALANCE (array lookups on the curves)
+    df = curves.to_frame(horizons)
+    df.insert(1, "current_stock", curves.stock)
+
+    # 4. ALERT LOGIC
+    df["status"] = alert_status(curves.balance_at(horizons), horizons, status)
+    df["forecast_method"] = method
+
+    # Longest horizon first (the headline numbers), then the shorter ones
+    h_max, rest = horizons[-1], horizons[:-1]
+    cols = (["sku_id", "current_stock", f"forecast_{h_max}d", f"supply_{h_max}d", f"balance_{h_max}d", "status",
+             "forecast_method"]
+            + [f"forecast_{h}d" for h in rest] + [f"balance_{h}d" for h in rest]
+            + [f"supply_{h}d" for h in rest] + ["stockout_date"])
+    return df[cols]
+
+def generate_forecasts(inventory_df, prod_df, po_df, horizons=HORIZONS, curves_path=None, as_of=None):
+    """
+    Builds daily cumulative demand/supply curves for every SKU and reports
+    forecast, supply and balance per horizon. The curves are saved to
+    `curves_path`; by default that is CURVES_PATH for a live run, while an
+    as_of run saves none, so it cannot replace the live curves that
+    refresh_forecasts and the planning scripts read. False never saves.
+    SKUs without a usable model get a fallback forecast (fallback_forecast);
+    "forecast_method" records which method produced each row.
+    `as_of` (a date) rebuilds the forecast as of the start of that day
+    instead of now; pass the stock on that day (see stock_as_of).
+    """
+    print(f"Generating forecasts for {len(inventory_df)} items"
+          + (f" as of {pd.Timestamp(as_of):%Y-%m-%d}" if as_of is not None else "") + "...\n")
+
+    horizons = sorted(set(horizons))
+    now = pd.Timestamp(as_of).normalize().to_pydatetime() if as_of is not None else datetime.now()
+    curves, status, method = _build_curves(inventory_df, prod_df, po_df, max(horizons), now, as_of)
+    if curves_path is None and as_of is None:
+        curves_path = CURVES_PATH
+    if curves_path:
+        curves.save(curves_path)
+    return _frame(curves, horizons, status, method)
+
+def input_fingerprints(inventory_df, prod_df, po_df, horizons=HORIZONS, now=None, store=None):
+    """
+    Hash of everything one SKU's forecast row depends on: its model version
+    (or, without a model, the sales history and fallback settings), its
+    inventory row, the supply rows inside the forecast window, the horizons
+    and the forecast day. Returns one string per inventory row.
+    """
+    now = now or datetime.now()
+    store = store or open_store()
+    horizons = sorted(set(horizons))
+    sku_ids = pd.Index(inventory_df["sku_id"].astype(str))
+
+    inv_hash = pd.util.hash_pandas_object(inventory_df.reset_index(drop=True), index=False).to_numpy()
+
+    # Supply rows that compute_incoming_supply would count, summed per SKU (order-independent)
+    supply_hash = np.zeros(len(sku_ids), dtype=np.uint64)
+    n_supply = np.zeros(len(sku_ids), dtype=np.int64)
+    events = _supply_events(prod_df, po_df)
+    if not events.empty:
+        offset = (events['standard_date'] - now) / pd.Timedelta(days=1)
+        codes = sku_ids.get_indexer(events['sku_id'].astype(str))
+        keep = ((codes >= 0) & (offset >= 0) & (offset <= max(horizons))).to_numpy()
+        if keep.any():
+            rows = pd.util.hash_pandas_object(events[keep].astype({"sku_id": str}), index=False).to_numpy()
+            np.add.at(supply_hash, codes[keep], rows)
+            np.add.at(n_supply, codes[keep], 1)
+
+    # Fallback SKUs depend on the sales history instead of a model version
+    sales_key = f"{os.path.getmtime(SALES_CSV) if SALES_CSV.exists() else ''}:{FALLBACK_METHOD}"
+    model_key = [store.version(sku) or f"fallback:{sales_key}" for sku in sku_ids]
+
+    run_key = f"{now:%Y-%m-%d}:{','.join(map(str, horizons))}"
+    parts = pd.DataFrame({"sku_id": sku_ids, "model": model_key, "inventory": inv_hash,
+                          "supply": supply_hash, "n_supply": n_supply, "run": run_key})
+    return pd.util.hash_pandas_object(parts, index=False).astype(str).to_numpy()
+
+def load_fingerprints(path=FINGERPRINTS_JSON):
+    if not Path(path).exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_fingerprints(sku_ids, fingerprints, path=FINGERPRINTS_JSON):
+    tmp = Path(path).with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(dict(zip(map(str, sku_ids), map(str, fingerprints))), f)
+    os.replace(tmp, path)
+
+def _previous_rows(sku_ids, results_path, curves_path, now):
+    """
+    (report rows, curve row per SKU or -1, curves) from the last run; None if
+    unusable, including curves that do not start today (an earlier day's run,
+    or an as_of run saved over them).
+    """
+    curves = load_curves(curves_path)
+    if curves is None or curves.origin != pd.Timestamp(now).normalize() or not Path(results_path).exists():
+        return None
+    prev = pd.read_json(results_path, orient='records', convert_dates=False, dtype=False)
+    if prev.empty or "sku_id" not in prev or not prev["sku_id"].is_unique:
+        return None
+    return prev.set_index("sku_id"), pd.Index(curves.sku_ids).get_indexer(sku_ids), curves
+
+def refresh_forecasts(inventory_df, prod_df, po_df, horizons=HORIZONS, curves_path=CURVES_PATH,
+                      results_path=OUTPUT_JSON, fingerprints_path=FINGERPRINTS_JSON, incremental=INCREMENTAL):
+    """
+    generate_forecasts() that only recomputes SKUs whose inputs changed
+    (see input_fingerprints) and takes every other row, and its curves,
+    from the previous run's results. Falls back to a full run when there is
+    no usable previous run. Returns (report, fingerprints, SKUs recomputed);
+    save the fingerprints once the report is written.
+    """
+    horizons = sorted(set(horizons))
+    now = datetime.now()
+    fingerprints = input_fingerprints(inventory_df, prod_df, po_df, horizons, now)
+    sku_ids = inventory_df["sku_id"].astype(str).tolist()
+
+    def full_run():
+        # False, not None: a None curves_path here means "do not save"
+        return generate_forecasts(inventory_df, prod_df, po_df, horizons, curves_path or False)
+
+    previous = _previous_rows(sku_ids, results_path, curves_path, now) if incremental and curves_path else None
+    if previous is None or not inventory_df["sku_id"].is_unique:
+        return full_run(), fingerprints, len(sku_ids)
+
+    prev_rows, prev_idx, prev_curves = previous
+    old = load_fingerprints(fingerprints_path)
+    changed = np.array([old.get(sku) != fp for sku, fp in zip(sku_ids, fingerprints)])
+    changed |= (prev_idx < 0) | ~pd.Index(sku_ids).isin(prev_rows.index)
+    changed |= prev_curves.n_days != max(horizons)
+    if changed.all():
+        return full_run(), fingerprints, len(sku_ids)
+
+    n_changed = int(changed.sum())
+    print(f"Inputs changed for {n_changed} of {len(sku_ids)} items; reusing the rest.\n")
+    n_days = max(horizons)
+    stock = prev_curves.stock[prev_idx].copy()
+    cum_demand = prev_curves.cum_demand[prev_idx].copy()
+    cum_supply = prev_curves.cum_supply[prev_idx].copy()
+    df = prev_rows.loc[np.asarray(sku_ids, dtype=object)[~changed]].reset_index()
+    df.index = np.flatnonzero(~changed)
+    if n_changed:
+        curves, status, method = _build_curves(inventory_df[changed], prod_df, po_df, n_days, now)
+        stock[changed], cum_demand[changed], cum_supply[changed] = curves.stock, curves.cum_demand, curves.cum_supply
+        new = _frame(curves, horizons, status, method)
+        new.index = np.flatnonzero(changed)
+        df = pd.concat([df[new.columns], new]).sort_index()
+    if curves_path:
+        ForecastCurves(sku_ids, now, stock, cum_demand, cum_supply).save(curves_path)
+    return df, fingerprints, n_changed
+
+def stock_as_of(inventory_df, as_of, prod_df, matrix=None, counted_at=None):
+    """
+    Inventory rolled back to the start of `as_of`: the counted stock plus
+    the sales recorded since, minus the production actually completed since
+    (clipped at 0). `counted_at` is when the stock was counted (default: now).
+    Returns a copy of inventory_df with a "current_stock" column.
+    """
+    as_of = pd.Timestamp(as_of).normalize()
+    counted_at = pd.Timestamp(counted_at or datetime.now())
+    sku_ids = inventory_df["sku_id"].astype(str).tolist()
+    stock = _current_stock(inventory_df).copy()
+
+    if matrix is not None:
+        rows = matrix.row_indices(sku_ids)
+        found = rows >= 0
+        lo = int(np.clip((as_of - matrix.dates[0]).days, 0, len(matrix.dates)))
+        hi = int(np.clip((counted_at.normalize() - matrix.dates[0]).days, lo, len(matrix.dates)))
+        stock[found] += np.asarray(matrix.values[rows[found], lo:hi], dtype=np.float64).sum(axis=1)
+
+    if not prod_df.empty and "actual_produced_quantity" in prod_df.columns:
+        done = prod_df[(prod_df["planned_date"] >= as_of) & (prod_df["planned_date"] < counted_at.normalize())]
+        produced = done.groupby(done["sku_id"].astype(str))["actual_produced_quantity"].sum()
+        stock -= produced.reindex(sku_ids, fill_value=0).to_numpy(dtype=float)
+
+    return inventory_df.assign(current_stock=np.maximum(stock, 0))
+
+def _write_partition(df, as_of, out_dir):
+    """One as_of=YYYY-MM-DD partition (Parquet with pyarrow, CSV otherwise), replaced atomically."""
+    part = Path(out_dir) / f"as_of={pd.Timestamp(as_of):%Y-%m-%d}"
+    os.makedirs(part, exist_ok=True)
+    path = part / f"forecasts.{BACKFILL_FORMAT}"
+    tmp = path.with_name(path.name + ".tmp")
+    if BACKFILL_FORMAT == "parquet":
+        # One schema for every partition: inferred, a day without stockouts
+        # writes stockout_date as type null, which cannot be read back with the string days
+        schema = pa.schema([(c, pa.string() if c in STRING_COLUMNS else pa.float64()) for c in df.columns])
+        df.to_parquet(tmp, index=False, schema=schema)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+_worker_inputs = None
+
+def _backfill_job(as_of, horizons, out_dir):
+    """Forecast as of one date into its partition. Returns (as_of, rows, path or message)."""
+    global _worker_inputs
+    try:
+        if _worker_inputs is None:
+            _worker_inputs = (load_table("finished_goods_inventory"), load_table("production_plan"),
+                              load_table("purchase_orders"), sales_history_matrix())
+        inv, prod, po, matrix = _worker_inputs
+        df = generate_forecasts(stock_as_of(inv, as_of, prod, matrix), prod, po, horizons,
+                                curves_path=None, as_of=as_of)
+        return as_of, len(df), str(_write_partition(df, as_of, out_dir))
+    except Exception as e:
+        return as_of, 0, f"Failed: {e}"
+
+def backfill(start, end, step_days=1, horizons=HORIZONS, n_workers=BACKFILL_WORKERS, out_dir=BACKFILL_DIR):
+    """
+    Forecasts as of every `step_days`-th date in [start, end], one date per
+    job across `n_workers` processes, each written to its own partition of
+    `out_dir` (read the whole range back with pd.read_parquet(out_dir)).
+    Stock on each date is rolled back from today's inventory (stock_as_of).
+    Returns [(as_of, rows, path or message)] in date order.
+    """
+    dates = pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=f"{step_days}D")
+    # Build the shared caches once, before the workers read them
+    if load_table("finished_goods_inventory").empty:
+        raise FileNotFoundError("Inventory file missing.")
+    load_table("production_plan")
+    load_table("purchase_orders")
+    sales_history_matrix()
+    print(f"Backfilling {len(dates)} dates ({dates[0]:%Y-%m-%d} .. {dates[-1]:%Y-%m-%d}) "
+          f"on {n_workers} workers...")
+
+    results = []
+    if n_workers <= 1:
+        for d in dates:
+            results.append(_backfill_job(d, horizons, out_dir))
+            print(f"   {d:%Y-%m-%d}: {results[-1][2]}")
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_backfill_job, d, horizons, out_dir) for d in dates]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+                print(f"   {results[-1][0]:%Y-%m-%d}: {results[-1][2]}")
+    return sorted(results, key=lambda r: r[0])
+
+def balances_from_curves(horizons, curves_path=CURVES_PATH):
+    """Any other horizons from the last run's curves - no predictions, no supply scan."""
+    curves = load_curves(curves_path)
+    if curves is None:
+        raise FileNotFoundError(f"No forecast curves at {curves_path}; run the forecaster first.")
+    return curves.to_frame(horizons)
+
+def backfill_main(args):
+    """python src/run_forecast.py backfill START END [STEP_DAYS]"""
+    if len(args) < 2:
+        print("usage: python src/run_forecast.py backfill START END [STEP_DAYS]")
+        return
+    try:
+        results = backfill(args[0], args[1], int(args[2]) if len(args) > 2 else 1)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+    failed = [r for r in results if r[2].startswith("Failed")]
+    print(f"\n✓ {len(results) - len(failed)} dates written to: {BACKFILL_DIR}"
+          + (f" ({len(failed)} failed)" if failed else ""))
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        return backfill_main(sys.argv[2:])
     print("="*80 + "\n      MULTI-HORIZON FORECASTER\n" + "="*80)
     
-    inv = load_csv("finished_goods_inventory.csv")
-    prod = load_csv("production_plan.csv")
-    po = load_csv("purchase_orders.csv")
+    inv = load_table("finished_goods_inventory")
+    prod = load_table("production_plan")
+    po = load_table("purchase_orders")
 
     if inv.empty:
         print("Error: Inventory file missing.")
         return
 
-    df = generate_forecasts(inv, prod, po)
-    df = df.sort_values("balance_30d", ascending=True)
+    df, fingerprints, n_changed = refresh_forecasts(inv, prod, po)
+    h_max = max(HORIZONS)
+    df = df.sort_values(f"balance_{h_max}d", ascending=True)
 
     # Display
-    cols = ['sku_id', 'current_stock', 'forecast_30d', 'supply_30d', 'balance_30d', 'status']
+    cols = ['sku_id', 'current_stock', f'forecast_{h_max}d', f'supply_{h_max}d', f'balance_{h_max}d', 'status']
     try:
         print(df[cols].head(15).to_markdown(index=False, floatfmt=".1f"))
     except:
         print(df[cols].head(15).to_string(index=False))
 
     df.to_json(OUTPUT_JSON, orient='records', indent=4)
-    print(f"\n✓ Results saved to: {OUTPUT_JSON}")
+    save_fingerprints(inv["sku_id"], fingerprints)
+    print(f"\n✓ Results saved to: {OUTPUT_JSON} ({n_changed} of {len(df)} items recomputed)")
+    print(f"✓ Demand/supply curves saved to: {CURVES_PATH}")
+
+    if REGION_FORECASTS:
+        matrix = get_region_matrix()
+        if matrix is None:
+            print("No regional sales history; skipping the SKU x region breakdown.")
+            return
+        regional = region_frame(load_curves(CURVES_PATH), matrix, HORIZONS)
+        regional.to_json(REGIONS_JSON, orient='records', indent=4)
+        print(f"✓ {len(regional)} SKU x region forecasts saved to: {REGIONS_JSON}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,242 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from data_loader import iter_table
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = BASE_DIR / "data"
+SALES_CSV = DATA_PATH / "sales_history.csv"
+CACHE_PATH = DATA_PATH / "cache"
+MATRIX_FILE = CACHE_PATH / "sales_matrix.npy"
+INDEX_FILE = CACHE_PATH / "sales_matrix.json"
+
+
+class SalesMatrix:
+    """
+    Dense, zero-filled SKU x day matrix of daily quantity_sold.
+    `values` is usually a read-only memmap, so slicing a row does not copy
+    the rest of the history.
+    """
+
+    def __init__(self, values, skus, start, first_idx, last_idx):
+        self.values = values
+        self.skus = list(skus)
+        self.dates = pd.date_range(start=start, periods=values.shape[1], freq='D')
+        self.first_idx = np.asarray(first_idx)
+        self.last_idx = np.asarray(last_idx)
+        self._rows = {sku: i for i, sku in enumerate(self.skus)}
+
+    def __contains__(self, sku_id):
+        return sku_id in self._rows
+
+    def __len__(self):
+        return len(self.skus)
+
+    def row(self, sku_id):
+        """Full-width row (global date range) for one SKU."""
+        return self.values[self._rows[sku_id]]
+
+    def row_indices(self, sku_ids):
+        """Row number per SKU, -1 for SKUs not in the matrix."""
+        return np.array([self._rows.get(sku, -1) for sku in sku_ids], dtype=np.int64)
+
+    def series(self, sku_id):
+        """Daily sales from the SKU's first to last recorded day, as a Series."""
+        i = self._rows[sku_id]
+        lo, hi = int(self.first_idx[i]), int(self.last_idx[i]) + 1
+        return pd.Series(self.values[i, lo:hi], index=self.dates[lo:hi], name=sku_id)
+
+    def history(self, sku_ids, lookback):
+        """
+        (values, observed mask, has-history flag) for sku_ids over the last
+        `lookback` days; SKUs not in the matrix get zero rows.
+        """
+        end = self.values.shape[1]
+        n_hist = min(lookback, end)
+        rows = self.row_indices(sku_ids)
+        found = rows >= 0
+        Y = np.zeros((len(sku_ids), n_hist))
+        observed = np.zeros((len(sku_ids), n_hist), dtype=bool)
+        if found.any():
+            Y[found] = self.values[rows[found], end - n_hist:]
+            # Days before a SKU's first sale are not zero-demand observations
+            cols = np.arange(end - n_hist, end)
+            observed[found] = cols[None, :] >= self.first_idx[rows[found]][:, None]
+        return Y, observed, found
+
+    def before(self, date):
+        """View of the history up to the day before `date` (no copy of the values)."""
+        day = int(np.clip((pd.Timestamp(date).normalize() - self.dates[0]).days, 0, len(self.dates)))
+        return SalesMatrix(self.values[:, :day], self.skus, self.dates[0], self.first_idx,
+                           np.minimum(self.last_idx, day - 1))
+
+    def fingerprint(self, sku_id):
+        return series_fingerprint(self.series(sku_id))
+
+
+def series_fingerprint(daily_sales):
+    """Content hash of a daily series: start date + float64 values."""
+    h = hashlib.sha1()
+    if len(daily_sales):
+        h.update(daily_sales.index[0].strftime("%Y-%m-%d").encode())
+    h.update(np.ascontiguousarray(daily_sales.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+class DailySalesAccumulator:
+    """
+    Folds raw sales rows, one chunk at a time, into per-SKU daily totals.
+    Only the SKU x day array is kept between chunks, so peak memory scales
+    with SKUs x days plus one chunk, not with the number of transaction rows.
+    Chunks may arrive in any order; the array grows (amortised doubling) as
+    new SKUs and dates appear.
+    """
+
+    def __init__(self):
+        self.skus = []
+        self._rows = {}
+        self.start = None
+        self.n_days = 0
+        self._values = np.zeros((0, 0), dtype=np.float64)
+        self._first = np.zeros(0, dtype=np.int64)
+        self._last = np.zeros(0, dtype=np.int64)
+
+    def _reserve(self, n_rows, n_days, shift=0):
+        """Capacity for n_rows x n_days; `shift` moves existing days right (earlier start)."""
+        cap_rows, cap_days = self._values.shape
+        if n_rows <= cap_rows and n_days <= cap_days and not shift:
+            return
+        rows = cap_rows if n_rows <= cap_rows else max(n_rows, 2 * cap_rows)
+        days = cap_days if n_days <= cap_days else max(n_days, 2 * cap_days)
+        n = len(self.skus)
+        values = np.zeros((rows, days), dtype=np.float64)
+        values[:n, shift:shift + self.n_days] = self._values[:n, :self.n_days]
+        first = np.full(rows, days, dtype=np.int64)
+        last = np.full(rows, -1, dtype=np.int64)
+        first[:n] = self._first[:n] + shift
+        last[:n] = self._last[:n] + shift
+        self._values, self._first, self._last = values, first, last
+
+    def add(self, df):
+        """Adds one chunk with columns: sku_id, date (datetime64), quantity_sold."""
+        daily = df.groupby(['sku_id', 'date'], observed=True)['quantity_sold'].sum()
+        if daily.empty:
+            return
+        sku_level = daily.index.get_level_values(0)
+        date_level = pd.DatetimeIndex(daily.index.get_level_values(1))
+
+        lo, hi = date_level.min(), date_level.max()
+        shift = 0
+        if self.start is None:
+            self.start = lo
+        elif lo < self.start:
+            shift = (self.start - lo).days
+            self.start = lo
+        n_days = max(self.n_days + shift, (hi - self.start).days + 1)
+        new_skus = [sku for sku in sku_level.unique() if sku not in self._rows]
+        self._reserve(len(self.skus) + len(new_skus), n_days, shift)
+        self.n_days = n_days
+        for sku in new_skus:
+            self._rows[sku] = len(self.skus)
+            self.skus.append(sku)
+
+        sku_codes = np.fromiter((self._rows[s] for s in sku_level), dtype=np.int64, count=len(sku_level))
+        day_codes = np.asarray((date_level - self.start).days)
+        # (sku, day) pairs are unique within a chunk, so += does not drop duplicates
+        self._values[sku_codes, day_codes] += daily.to_numpy(dtype=np.float64)
+        # First/last recorded day per SKU (a row with quantity 0 still counts)
+        np.minimum.at(self._first, sku_codes, day_codes)
+        np.maximum.at(self._last, sku_codes, day_codes)
+
+    def finish(self):
+        """SalesMatrix with SKUs in sorted order, trimmed to the observed date range."""
+        if not self.skus:
+            raise ValueError("No sales rows to build the matrix from")
+        order = sorted(range(len(self.skus)), key=lambda i: self.skus[i])
+        values = self._values[order, :self.n_days]
+        return SalesMatrix(values, [self.skus[i] for i in order], self.start,
+                           self._first[order], self._last[order])
+
+
+def build_sales_matrix(chunks):
+    """
+    Streams raw sales rows into a SalesMatrix held in memory.
+    `chunks` is one DataFrame or an iterable of DataFrames
+    (columns: sku_id, date (datetime64), quantity_sold).
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    acc = DailySalesAccumulator()
+    for chunk in chunks:
+        acc.add(chunk)
+    return acc.finish()
+
+
+def save_sales_matrix(matrix, source_path=None, matrix_file=MATRIX_FILE, index_file=INDEX_FILE):
+    """Writes the matrix as .npy plus a small JSON index (atomic replace)."""
+    matrix_file, index_file = Path(matrix_file), Path(index_file)
+    os.makedirs(matrix_file.parent, exist_ok=True)
+    tmp_npy = matrix_file.with_name(matrix_file.stem + ".tmp.npy")
+    np.save(tmp_npy, np.ascontiguousarray(matrix.values))
+    os.replace(tmp_npy, matrix_file)
+
+    index = {
+        "skus": matrix.skus,
+        "start": matrix.dates[0].strftime("%Y-%m-%d"),
+        "first_idx": matrix.first_idx.tolist(),
+        "last_idx": matrix.last_idx.tolist(),
+        "source_mtime": os.path.getmtime(source_path) if source_path else None,
+    }
+    tmp_json = index_file.with_suffix(".tmp")
+    with open(tmp_json, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_json, index_file)
+    return matrix_file
+
+
+def load_sales_matrix(mmap_mode="r", matrix_file=MATRIX_FILE, index_file=INDEX_FILE):
+    """Opens the saved matrix memory-mapped; returns None if it was never built."""
+    matrix_file, index_file = Path(matrix_file), Path(index_file)
+    if not (matrix_file.exists() and index_file.exists()):
+        return None
+    with open(index_file) as f:
+        index = json.load(f)
+    values = np.load(matrix_file, mmap_mode=mmap_mode)
+    return SalesMatrix(values, index["skus"], index["start"], index["first_idx"], index["last_idx"])
+
+
+def is_stale(source_path, matrix_file=MATRIX_FILE, index_file=INDEX_FILE):
+    """True when the cached matrix is missing or older than its source CSV."""
+    if not (Path(matrix_file).exists() and Path(index_file).exists() and Path(source_path).exists()):
+        return True
+    with open(index_file) as f:
+        cached_mtime = json.load(f).get("source_mtime")
+    return cached_mtime != os.path.getmtime(source_path)
+
+
+def get_sales_matrix(load_chunks, source_path, matrix_file=MATRIX_FILE, index_file=INDEX_FILE):
+    """
+    Shared input for training, validation and backtesting.
+    Rebuilds from `load_chunks()` (a DataFrame or an iterable of chunks)
+    only when the source CSV changed, then returns the memory-mapped copy.
+    """
+    if is_stale(source_path, matrix_file, index_file):
+        print(f"Building SKU x day sales matrix ({Path(matrix_file).name})...")
+        save_sales_matrix(build_sales_matrix(load_chunks()), source_path, matrix_file, index_file)
+    return load_sales_matrix(matrix_file=matrix_file, index_file=index_file)
+
+
+def sales_history_matrix():
+    """
+    SKU x day matrix of sales_history.csv for the forecasting side: the
+    training cache, rebuilt if stale, or the cached copy alone when the CSV
+    is gone. None when neither exists.
+    """
+    if SALES_CSV.exists():
+        return get_sales_matrix(lambda: iter_table("sales_history"), SALES_CSV)
+    return load_sales_matrix()
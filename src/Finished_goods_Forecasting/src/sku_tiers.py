@@ -0,0 +1,116 @@
+import numpy as np
+import os
+
+# --- CONFIGURATION ---
+# History used to rank SKUs (days back from the last recorded day)
+TIER_LOOKBACK_DAYS = int(os.getenv("TIER_LOOKBACK_DAYS", 182))
+# ABC: cumulative share of volume covered by A, then by A + B
+ABC_SHARES = (0.80, 0.95)
+# XYZ: coefficient of variation of weekly sales below which a SKU is X, then Y
+XYZ_CV = (0.5, 1.0)
+# Training method per class, cheapest last:
+#   "search" - full seasonal auto_arima (see train_models.REFIT_MODE)
+#   "fixed"  - the SKU's stored order, or FIXED_ORDER, fitted without a search
+#   "batch"  - no per-SKU model; vectorized fallback_forecast methods for all at once
+TIER_METHODS = {
+    "AX": "search", "AY": "search", "AZ": "fixed",
+    "BX": "fixed", "BY": "fixed", "BZ": "fixed",
+    "CX": "batch", "CY": "batch", "CZ": "batch",
+}
+METHOD_ORDER = ["search", "fixed", "batch"]
+FIXED_ORDER = {"order": (1, 0, 1), "seasonal_order": (0, 1, 1, 7), "with_intercept": True}
+
+
+def parse_budgets(value):
+    """'search=600,fixed=120' -> {"search": 600.0, "fixed": 120.0}; unset tiers are unbounded."""
+    budgets = {}
+    for part in filter(None, (p.strip() for p in (value or "").split(","))):
+        method, seconds = part.split("=")
+        budgets[method.strip()] = float(seconds)
+    return budgets
+
+
+# Wall-clock seconds per tier; tiers run in METHOD_ORDER, and SKUs still
+# waiting when their tier's budget is spent drop to the next cheaper method
+TIER_BUDGETS = parse_budgets(os.getenv("TRAIN_TIER_BUDGETS", ""))
+
+
+def classify_skus(matrix, lookback=TIER_LOOKBACK_DAYS):
+    """
+    ABC/XYZ class per SKU from the SKU x day sales matrix, e.g. {"SKU-1": "AX"}.
+    ABC ranks total volume over the last `lookback` days; XYZ is the
+    coefficient of variation of weekly totals over the SKU's observed weeks.
+    """
+    end = matrix.values.shape[1]
+    start = max(0, end - lookback)
+    window = np.asarray(matrix.values[:, start:end], dtype=np.float64)
+    volume = window.sum(axis=1)
+
+    # ABC: the SKUs that make up the first ABC_SHARES of volume
+    order = np.argsort(-volume, kind="stable")
+    total = volume.sum()
+    share = np.cumsum(volume[order]) / total if total > 0 else np.ones(len(order))
+    # A SKU belongs to the band its cumulative share starts in
+    before = np.concatenate([[0.0], share[:-1]])
+    abc_sorted = np.where(before < ABC_SHARES[0], "A", np.where(before < ABC_SHARES[1], "B", "C"))
+    abc = np.empty(len(volume), dtype="<U1")
+    abc[order] = abc_sorted
+
+    # XYZ: weekly totals, counting only whole weeks after the SKU's first sale
+    n_weeks = window.shape[1] // 7
+    weekly = window[:, window.shape[1] - n_weeks * 7:].reshape(len(volume), n_weeks, 7).sum(axis=2)
+    week_start = end - n_weeks * 7 + 7 * np.arange(n_weeks)
+    observed = week_start[None, :] >= np.asarray(matrix.first_idx)[:, None]
+    n_obs = observed.sum(axis=1)
+    mean = np.divide((weekly * observed).sum(axis=1), n_obs, out=np.zeros(len(volume)), where=n_obs > 0)
+    var = np.divide((((weekly - mean[:, None]) * observed) ** 2).sum(axis=1), n_obs,
+                    out=np.zeros(len(volume)), where=n_obs > 0)
+    cv = np.divide(np.sqrt(var), mean, out=np.full(len(volume), np.inf), where=mean > 0)
+    xyz = np.where(cv < XYZ_CV[0], "X", np.where(cv < XYZ_CV[1], "Y", "Z"))
+
+    return {sku: a + x for sku, a, x in zip(matrix.skus, abc, xyz)}
+
+
+def cheaper_method(method):
+    """Next method down METHOD_ORDER (None below "batch")."""
+    i = METHOD_ORDER.index(method) + 1
+    return METHOD_ORDER[i] if i < len(METHOD_ORDER) else None
+
+
+def tier_deadlines(start, budgets=TIER_BUDGETS):
+    """Absolute deadline per method; each tier's budget starts where the previous one's ends."""
+    deadlines, t = {}, start
+    for method in METHOD_ORDER:
+        if method not in budgets:
+            continue
+        t += budgets[method]
+        deadlines[method] = t
+    return deadlines
+
+
+def tier_report(results, classes, budgets=TIER_BUDGETS):
+    """
+    Accuracy/time per training method, from result dicts carrying
+    "method", "assigned_method", "mape" and "seconds".
+    """
+    rows = []
+    for method in METHOD_ORDER:
+        res = [r for r in results if r.get("method") == method]
+        if not res and not any(r.get("assigned_method") == method for r in results):
+            continue
+        mapes = [r["mape"] for r in res if r.get("mape") is not None]
+        seconds = sum(r.get("seconds") or 0.0 for r in res)
+        rows.append({
+            "method": method,
+            "classes": sorted({classes[r["sku_id"]] for r in res if r["sku_id"] in classes}),
+            "skus": len(res),
+            "demoted_in": sum(1 for r in res if r.get("assigned_method") not in (None, method)),
+            "failed": sum(1 for r in res if r.get("status") == "failed"),
+            "timeouts": sum(1 for r in res if r.get("timeout")),
+            "mean_mape": float(np.mean(mapes)) if mapes else None,
+            "median_mape": float(np.median(mapes)) if mapes else None,
+            "seconds": round(seconds, 3),
+            "seconds_per_sku": round(seconds / len(res), 3) if res else None,
+            "budget_seconds": budgets.get(method),
+        })
+    return rows
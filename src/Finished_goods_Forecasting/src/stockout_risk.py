@@ -0,0 +1,196 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from pathlib import Path
+from statistics import NormalDist
+
+from data_loader import load_table
+from forecast_cache import CACHE_ALPHA, forecast_origin, load_forecast_cache
+from forecast_curves import CURVES_PATH, load_curves
+from model_store import open_store
+from run_forecast import HORIZONS
+from sales_matrix import sales_history_matrix
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+RISK_JSON = BASE_DIR / "stockout_risk.json"
+N_SCENARIOS = int(os.getenv("SIM_SCENARIOS", 2000))
+SEED = int(os.getenv("SIM_SEED", 0))
+# Correlation of consecutive days' forecast errors (AR(1)); 0 = independent days
+DEMAND_CORR = float(os.getenv("SIM_DEMAND_CORR", 0.5))
+# Days of history behind the error spread of SKUs without a model interval
+RESIDUAL_DAYS = int(os.getenv("SIM_RESIDUAL_DAYS", 56))
+# Supply delay distribution as "days:probability,..." (e.g. "0:0.8,3:0.15,7:0.05");
+# unset = lateness of past purchase-order deliveries
+SUPPLY_DELAYS = os.getenv("SIM_SUPPLY_DELAYS", "")
+# Upper bound on SKU x scenario x day cells held at once; SKUs are simulated in batches below it
+MAX_CELLS = int(os.getenv("SIM_MAX_CELLS", 20_000_000))
+
+
+def parse_delays(value):
+    """"0:0.8,3:0.2" -> (days array, probabilities); None when unset."""
+    parts = [p.split(":") for p in filter(None, (p.strip() for p in (value or "").split(",")))]
+    if not parts:
+        return None
+    days = np.array([int(d) for d, _ in parts])
+    probs = np.array([float(p) for _, p in parts])
+    return days, probs / probs.sum()
+
+
+def supply_scenarios(po_df, prod_df, spec=SUPPLY_DELAYS):
+    """
+    (delay days, probabilities) and arrival quantity ratios (actual / planned)
+    to resample from. Delays come from `spec`, else from past PO lateness;
+    ratios from completed production. Both default to "on time, in full".
+    """
+    delays = parse_delays(spec)
+    if delays is None:
+        late = np.zeros(1, dtype=np.int64)
+        if not po_df.empty and {"actual_delivery_date", "expected_delivery_date"} <= set(po_df.columns):
+            days = (po_df["actual_delivery_date"] - po_df["expected_delivery_date"]).dt.days.dropna()
+            if len(days):
+                late = np.maximum(days.to_numpy(dtype=np.int64), 0)
+        values, counts = np.unique(late, return_counts=True)
+        delays = values, counts / counts.sum()
+
+    ratios = np.ones(1)
+    if not prod_df.empty and {"planned_quantity", "actual_produced_quantity"} <= set(prod_df.columns):
+        done = prod_df.dropna(subset=["actual_produced_quantity"])
+        done = done[done["planned_quantity"] > 0]
+        if len(done):
+            ratios = (done["actual_produced_quantity"] / done["planned_quantity"]).to_numpy(dtype=np.float64)
+    return delays, ratios
+
+
+def demand_spread(curves, store=None, cache=None, matrix=None, alpha=CACHE_ALPHA):
+    """
+    Standard deviation of each SKU's daily demand forecast, shape (n_sku, n_days):
+    from the model's forecast interval in the forecast cache where there is
+    one, otherwise the spread of the SKU's last RESIDUAL_DAYS of daily sales.
+    """
+    store = store or open_store()
+    cache = cache or load_forecast_cache()
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    n_sku, n_days = curves.cum_demand.shape
+    sigma = np.full((n_sku, n_days), np.nan)
+    for i, sku in enumerate(curves.sku_ids):
+        if sku in store:
+            hit = cache.lookup(sku, store.version(sku), forecast_origin(store.meta(sku)), n_days)
+            if hit is not None:
+                sigma[i] = (hit[1][:, 1] - hit[1][:, 0]) / (2 * z)
+
+    rest = np.flatnonzero(np.isnan(sigma[:, 0]))
+    sigma[rest] = 0.0
+    if len(rest) and matrix is not None:
+        Y, observed, found = matrix.history(list(curves.sku_ids[rest]), RESIDUAL_DAYS)
+        n = observed.sum(axis=1)
+        mean = np.divide((Y * observed).sum(axis=1), n, out=np.zeros(len(rest)), where=n > 0)
+        var = np.divide((((Y - mean[:, None]) * observed) ** 2).sum(axis=1), np.maximum(n - 1, 1),
+                        out=np.zeros(len(rest)), where=n > 1)
+        sigma[rest] = np.sqrt(var)[:, None]
+    return sigma
+
+
+def _ar1_factor(n_days, rho):
+    """Lower Cholesky factor of the AR(1) correlation matrix rho^|i - j|."""
+    lags = np.abs(np.subtract.outer(np.arange(n_days), np.arange(n_days)))
+    return np.linalg.cholesky(rho ** lags) if rho > 0 else np.eye(n_days)
+
+
+def simulate_stockouts(curves, sigma, horizons=HORIZONS, delays=None, ratios=None,
+                       n_scenarios=N_SCENARIOS, corr=DEMAND_CORR, seed=SEED):
+    """
+    Monte Carlo stockout risk for every SKU of a forecast run.
+
+    Each scenario draws a daily demand path (the forecast plus AR(1)
+    correlated normal errors with per-day spread `sigma`, floored at 0) and
+    a supply path (every day's arrivals delayed by a draw from `delays` and
+    scaled by a draw from `ratios`; arrivals pushed past the last day are
+    lost). Arrays are SKUs x scenarios x days; SKUs are processed in
+    batches of at most MAX_CELLS cells.
+
+    Returns (probability of a stockout by each horizon, shape (n_sku, len(horizons)),
+    mean shortfall at the longest horizon per SKU).
+    """
+    horizons = sorted(set(horizons))
+    rng = np.random.default_rng(seed)
+    n_sku, n_days = curves.cum_demand.shape
+    mean = np.diff(curves.cum_demand, axis=1, prepend=0.0).astype(np.float32)
+    sigma = np.asarray(sigma, dtype=np.float32)
+    arrivals = np.diff(curves.cum_supply, axis=1, prepend=0.0)
+    delay_days, delay_probs = delays if delays is not None else (np.zeros(1, dtype=np.int64), np.ones(1))
+    ratios = np.ones(1) if ratios is None else np.asarray(ratios, dtype=np.float64)
+    factor = _ar1_factor(n_days, corr).astype(np.float32)
+    cols = np.asarray(horizons) - 1
+
+    prob = np.zeros((n_sku, len(horizons)))
+    shortfall = np.zeros(n_sku)
+    batch = max(1, MAX_CELLS // (n_scenarios * n_days))
+    for lo in range(0, n_sku, batch):
+        hi = min(lo + batch, n_sku)
+        n = hi - lo
+
+        # Demand: correlated standard normals, scaled per SKU and day (float32 halves the memory)
+        z = rng.standard_normal((n, n_scenarios, n_days), dtype=np.float32) @ factor.T
+        z *= sigma[lo:hi, None, :]
+        z += mean[lo:hi, None, :]
+        np.maximum(z, 0, out=z)
+        cum = np.cumsum(z, axis=2, out=z)
+
+        # Supply: each arrival lands `delay` days later, scaled by a yield ratio;
+        # only (SKU, day) cells with an arrival are drawn
+        sku, day = np.nonzero(arrivals[lo:hi])
+        if len(sku):
+            delay = rng.choice(delay_days, size=(len(sku), n_scenarios), p=delay_probs)
+            qty = arrivals[lo:hi][sku, day][:, None] * rng.choice(ratios, size=(len(sku), n_scenarios))
+            landed = np.minimum(day[:, None] + delay, n_days)
+            cell = (sku[:, None] * n_scenarios + np.arange(n_scenarios)) * (n_days + 1) + landed
+            supply = np.bincount(cell.ravel(), weights=qty.ravel(), minlength=n * n_scenarios * (n_days + 1))
+            cum -= np.cumsum(supply.reshape(n, n_scenarios, n_days + 1)[..., :n_days], axis=2)
+
+        # Stockout once cumulative demand net of supply exceeds the opening stock
+        stock = curves.stock[lo:hi, None, None]
+        negative = cum > stock
+        first = np.where(negative.any(axis=2), negative.argmax(axis=2), n_days)
+        prob[lo:hi] = (first[:, :, None] <= cols[None, None, :]).mean(axis=1)
+        shortfall[lo:hi] = np.maximum(cum[:, :, cols[-1]] - stock[:, :, 0], 0).mean(axis=1)
+    return prob, shortfall
+
+
+def risk_frame(curves, prob, shortfall, horizons=HORIZONS):
+    horizons = sorted(set(horizons))
+    out = {"sku_id": curves.sku_ids}
+    for j, h in enumerate(horizons):
+        out[f"stockout_prob_{h}d"] = np.round(prob[:, j], 4)
+    out[f"expected_shortfall_{horizons[-1]}d"] = np.round(shortfall, 1)
+    return pd.DataFrame(out)
+
+
+def main():
+    print("="*60 + "\n   STOCKOUT RISK SIMULATION\n" + "="*60)
+    curves = load_curves(CURVES_PATH)
+    if curves is None:
+        print(f"No forecast curves at {CURVES_PATH}; run the forecaster first.")
+        return
+    horizons = [h for h in sorted(set(HORIZONS)) if h <= curves.n_days]
+    delays, ratios = supply_scenarios(load_table("purchase_orders"), load_table("production_plan"))
+    sigma = demand_spread(curves, matrix=sales_history_matrix())
+
+    print(f"Simulating {len(curves.sku_ids)} SKUs x {N_SCENARIOS} scenarios x {curves.n_days} days...")
+    start = time.time()
+    prob, shortfall = simulate_stockouts(curves, sigma, horizons, delays, ratios)
+    print(f"Simulation finished in {time.time() - start:.1f}s")
+
+    df = risk_frame(curves, prob, shortfall, horizons).sort_values(f"stockout_prob_{horizons[-1]}d",
+                                                                   ascending=False)
+    try:
+        print(df.head(15).to_markdown(index=False, floatfmt=".3f"))
+    except ImportError:
+        print(df.head(15).to_string(index=False))
+    df.to_json(RISK_JSON, orient='records', indent=4)
+    print(f"\n✓ Stockout probabilities saved to: {RISK_JSON}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import run_forecast
+from forecast_curves import ForecastCurves
+
+DATES = ["2025-06-01", "2025-06-02", "2025-06-03"]
+
+
+def _forecast(inventory_df, prod_df, po_df, horizons, curves_path=None, as_of=None):
+    """Stand-in for generate_forecasts: nothing stocks out on the first date, SKU-2 does later."""
+    horizons = sorted(set(horizons))
+    n_days = max(horizons)
+    stock = np.array([500.0, 1000.0 if pd.Timestamp(as_of) == pd.Timestamp(DATES[0]) else 20.0])
+    demand = np.cumsum(np.full((2, n_days), 3.0), axis=1)
+    curves = ForecastCurves(np.array(["SKU-1", "SKU-2"]), as_of, stock, demand, np.zeros((2, n_days)))
+    return run_forecast._frame(curves, horizons, np.array(["OK", "OK"], dtype=object),
+                               np.array(["arima", "ses"], dtype=object))
+
+
+def test_backfill_partitions_read_back():
+    if run_forecast.BACKFILL_FORMAT != "parquet":
+        return
+    inputs = {"finished_goods_inventory": pd.DataFrame({"sku_id": ["SKU-1", "SKU-2"]})}
+    patched = {"generate_forecasts": _forecast, "stock_as_of": lambda inv, *args: inv,
+               "load_table": lambda name: inputs.get(name, pd.DataFrame()), "sales_history_matrix": lambda: None}
+    saved = {name: getattr(run_forecast, name) for name in patched}
+    try:
+        for name, fn in patched.items():
+            setattr(run_forecast, name, fn)
+        run_forecast._worker_inputs = None
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run_forecast.backfill(DATES[0], DATES[-1], n_workers=1, out_dir=tmp)
+            assert [r[1] for r in results] == [2, 2, 2]
+
+            df = pd.read_parquet(tmp)
+            assert len(df) == 6
+            assert df[df["as_of"].astype(str) == DATES[0]]["stockout_date"].isna().all()
+            assert df[df["as_of"].astype(str) != DATES[0]]["stockout_date"].notna().sum() == 2
+    finally:
+        for name, fn in saved.items():
+            setattr(run_forecast, name, fn)
+        run_forecast._worker_inputs = None
+
+
+if __name__ == "__main__":
+    test_backfill_partitions_read_back()
+    print("✓ Backfill: partitions with and without stockouts read back as one dataset")
@@ -0,0 +1,82 @@
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pmdarima as pm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from compact_arima import export_compact, load_compact, save_compact
+
+
+def _weekly_series(n=180, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    return 1000 + 3 * t + 200 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 40, n)
+
+
+def _assert_matches(model, compact, n_periods=30):
+    preds, conf = model.predict(n_periods=n_periods, return_conf_int=True)
+    c_preds, c_conf = compact.predict(n_periods=n_periods, return_conf_int=True)
+    np.testing.assert_allclose(c_preds, preds, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(c_conf, conf, rtol=1e-6, atol=1e-6)
+
+
+def test_compact_matches_predict():
+    y = _weekly_series()
+    specs = [
+        ((1, 1, 1), (1, 0, 1, 7), True),
+        ((2, 0, 0), (0, 1, 1, 7), True),
+        ((0, 0, 0), (2, 1, 0, 7), False),
+    ]
+    for order, seasonal_order, with_intercept in specs:
+        model = pm.ARIMA(order=order, seasonal_order=seasonal_order,
+                         with_intercept=with_intercept, suppress_warnings=True).fit(y)
+        _assert_matches(model, export_compact(model))
+
+
+def test_compact_after_update_and_roundtrip():
+    y = _weekly_series(200, seed=1)
+    model = pm.ARIMA(order=(1, 0, 1), seasonal_order=(1, 1, 0, 7), suppress_warnings=True).fit(y[:190])
+    model.update(y[190:])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_compact(export_compact(model), Path(tmp) / "sku.npz")
+        _assert_matches(model, load_compact(path))
+
+
+def compare_with_joblib(models_path):
+    """Size and load-time of a {sku_id: model} joblib vs. the compact exports."""
+    t0 = time.perf_counter()
+    models = joblib.load(models_path)
+    joblib_load = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [save_compact(export_compact(m), Path(tmp) / f"{i}.npz") for i, m in enumerate(models.values())]
+        compact_size = sum(p.stat().st_size for p in paths)
+        t0 = time.perf_counter()
+        compacts = [load_compact(p) for p in paths]
+        compact_load = time.perf_counter() - t0
+        max_err = max(np.abs(c.predict(30) - m.predict(n_periods=30)).max()
+                      for c, m in zip(compacts, models.values()))
+
+    joblib_size = Path(models_path).stat().st_size
+    print(f"SKUs:            {len(models)}")
+    print(f"joblib:          {joblib_size / 1e6:10.2f} MB  load {joblib_load:8.3f}s")
+    print(f"compact (.npz):  {compact_size / 1e6:10.2f} MB  load {compact_load:8.3f}s")
+    print(f"size ratio:      {joblib_size / compact_size:10.0f}x")
+    print(f"max |forecast difference| over 30 days: {max_err:.2e}")
+
+
+if __name__ == "__main__":
+    test_compact_matches_predict()
+    test_compact_after_update_and_roundtrip()
+    print("✓ Compact forecasts match model.predict(n_periods=30)\n")
+
+    default = Path(__file__).resolve().parent.parent / "models" / "all_models.joblib"
+    models_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default
+    if models_path.exists():
+        compare_with_joblib(models_path)
+    else:
+        print(f"No {models_path} to compare against.")
@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import joblib
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from job_queue import JobQueue, run_worker
+
+
+def _double(job, run):
+    """Stand-in for run_queue_job: cheap, and records which process ran it."""
+    time.sleep(0.05)
+    return {"sku_id": job["sku_id"], "value": 2 * json.loads(job["args"])["x"], "pid": os.getpid(),
+            "message": "ok"}
+
+
+def _stall_first(job, run):
+    """Like _double, but the first lease of SKU-0 hangs until its worker is killed."""
+    if job["sku_id"] == "SKU-0" and job["attempts"] == 1:
+        time.sleep(600)
+    return _double(job, run)
+
+
+def test_expired_lease_is_taken_over():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(Path(tmp) / "queue.db", lease_seconds=0.2)
+        run_id, _ = queue.create_run()
+        queue.enqueue(run_id, [("SKU-1", {"x": 1})])
+
+        first = queue.lease("crashed")
+        assert first["sku_id"] == "SKU-1"
+        assert queue.lease("other") is None          # still leased
+        time.sleep(0.3)
+        second = queue.lease("other")                # lease expired -> re-leased
+        assert second["sku_id"] == "SKU-1" and second["attempts"] == 2
+        assert not queue.complete(first, "crashed")  # the old owner lost it
+        assert queue.complete(second, "other")
+        assert queue.counts(run_id) == {"done": 1}
+
+
+def test_job_fails_after_max_attempts():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(Path(tmp) / "queue.db", lease_seconds=0.05, max_attempts=2)
+        run_id, _ = queue.create_run()
+        queue.enqueue(run_id, [("SKU-1", {"x": 1})])
+        for _ in range(2):
+            assert queue.lease("crashing") is not None
+            time.sleep(0.1)
+        assert queue.lease("crashing") is None
+        assert queue.counts(run_id) == {"failed": 1}
+
+
+def test_workers_drain_queue_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "queue.db"
+        queue = JobQueue(path)
+        run_id, _ = queue.create_run()
+        queue.enqueue(run_id, [(f"SKU-{i}", {"x": i}) for i in range(30)])
+
+        procs = [multiprocessing.Process(target=run_worker, args=(str(path), _double),
+                                         kwargs={"idle_exit": 0.5}) for _ in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(timeout=60)
+
+        jobs = queue.jobs(run_id)
+        assert [j["status"] for j in jobs] == ["done"] * 30
+        results = [joblib.load(j["result_path"]) for j in jobs]
+        assert [r["value"] for r in results] == [2 * i for i in range(30)]
+        assert len({r["pid"] for r in results}) > 1   # work was shared
+        queue.finish_run(run_id)
+        assert queue.counts() == {}
+
+
+def test_coordinator_finishes_after_worker_crash():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "queue.db"
+        queue = JobQueue(path, lease_seconds=5)
+        run_id, _ = queue.create_run()
+        queue.enqueue(run_id, [(f"SKU-{i}", {"x": i}) for i in range(10)])
+
+        procs = [multiprocessing.Process(target=run_worker, args=(str(path), _stall_first),
+                                         kwargs={"idle_exit": 0.2, "lease_seconds": 5}) for _ in range(2)]
+        for p in procs:
+            p.start()
+        # Kill whichever worker holds SKU-0; the idle one must outlive its lease
+        while True:
+            owner = queue.jobs(run_id)[0]["worker"]
+            if owner:
+                break
+            time.sleep(0.05)
+        crashed = next(p for p in procs if p.pid == int(owner.split(":")[1]))
+        crashed.kill()
+
+        counts = queue.wait(run_id, timeout=60, poll=0.1)
+        assert counts == {"done": 10}
+        jobs = queue.jobs(run_id)
+        assert jobs[0]["attempts"] == 2 and jobs[0]["worker"] != owner
+        for p in procs:
+            p.join(timeout=30)
+            assert not p.is_alive()
+
+
+def test_wait_fails_unfinished_jobs_at_deadline():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(Path(tmp) / "queue.db")
+        run_id, _ = queue.create_run()
+        queue.enqueue(run_id, [("SKU-1", {"x": 1}), ("SKU-2", {"x": 2})])
+        queue.lease("stuck")
+        assert queue.wait(run_id, timeout=0.2, poll=0.05) == {"failed": 2}
+
+
+if __name__ == "__main__":
+    test_expired_lease_is_taken_over()
+    test_job_fails_after_max_attempts()
+    test_workers_drain_queue_once()
+    test_coordinator_finishes_after_worker_crash()
+    test_wait_fails_unfinished_jobs_at_deadline()
+    print("✓ Job queue: lease expiry, max attempts, multi-process drain, worker crash, deadline")
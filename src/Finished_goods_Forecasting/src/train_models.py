@@ -2,56 +2,186 @@ import pandas as pd
 import numpy as np
 import pmdarima as pm
 import joblib
+import json
+import multiprocessing
 import os
+import shutil
+import signal
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from sklearn.metrics import mean_absolute_percentage_error
 
+from arima_orders import fit_order, order_spec
+from data_loader import iter_table
+from fallback_forecast import holdout_mape
+from forecast_cache import refresh_forecast_cache
+from model_store import open_store
+from job_queue import JobQueue, run_worker
+from sales_matrix import INDEX_FILE, MATRIX_FILE, get_sales_matrix, load_sales_matrix, series_fingerprint
+from training_report import build_report, sku_row, write_report
+from sku_tiers import (FIXED_ORDER, METHOD_ORDER, TIER_BUDGETS, TIER_METHODS, cheaper_method,
+                       classify_skus, tier_deadlines, tier_report)
+
 # --- CONFIGURATION ---
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_PATH = BASE_DIR / "data"
 MODEL_PATH = BASE_DIR / "models"
+SALES_CSV = DATA_PATH / "sales_history.csv"
+# Worker processes for per-SKU training (1 = train sequentially in-process)
+N_WORKERS = int(os.getenv("TRAIN_WORKERS", os.cpu_count() or 1))
+# How the final (full-history) model is obtained:
+#   "search" - second full auto_arima search on the full series
+#   "reuse"  - refit the order chosen during validation (no second search)
+#   "warm"   - reuse the order stored for the SKU in the model store for
+#              both fits; SKUs without a previous model fall back to "reuse"
+REFIT_MODE = os.getenv("TRAIN_REFIT_MODE", "search")
+# "full" retrains every SKU; "incremental" feeds only the days after each
+# SKU's watermark into its existing model and refits on drift or age
+TRAIN_MODE = os.getenv("TRAIN_MODE", "full")
+# Incremental mode: force a full refit once the last full fit is this old...
+MAX_MODEL_AGE_DAYS = int(os.getenv("TRAIN_MAX_MODEL_AGE_DAYS", 28))
+# ...or when the MAPE on the new days exceeds DRIFT_FACTOR x validation MAPE
+DRIFT_FACTOR = float(os.getenv("TRAIN_DRIFT_FACTOR", 2.0))
+# Reuse the previous model (and its MAPE) when a SKU's daily series is unchanged
+SKIP_UNCHANGED = os.getenv("TRAIN_SKIP_UNCHANGED", "1") == "1"
+# "abc" ranks SKUs by volume/variability (sku_tiers) and spends the full
+# search only on the top tier; "off" searches every SKU
+TIERING = os.getenv("TRAIN_TIERING", "off")
+TIER_REPORT = MODEL_PATH / "tier_report.json"
+# Shared job queue (SQLite file, e.g. on shared storage): when set, SKUs are
+# enqueued there and trained by job_queue workers on any host instead of the
+# local pool; TRAIN_QUEUE_LOCAL_WORKERS workers are also started on this host
+QUEUE_PATH = os.getenv("TRAIN_QUEUE", "")
+QUEUE_LOCAL_WORKERS = int(os.getenv("TRAIN_QUEUE_LOCAL_WORKERS", 0))
+# Seconds the coordinator waits for a queued run; jobs still unfinished then fail
+QUEUE_TIMEOUT = float(os.getenv("TRAIN_QUEUE_TIMEOUT", 24 * 3600))
+# Per-SKU fit budget in seconds (0 = unlimited). Searches stop at the best
+# model found once it is spent; a single fit running past HARD_LIMIT_FACTOR x
+# the budget is aborted and the SKU goes to the batch (fallback) tier
+SKU_TIME_LIMIT = float(os.getenv("TRAIN_SKU_TIME_LIMIT", 120))
+HARD_LIMIT_FACTOR = 2.0
+# auto_arima order-search bounds (pmdarima's defaults unless overridden),
+# e.g. TRAIN_SEARCH_LIMITS="max_p=3,max_q=3,max_steps=40"
+SEARCH_LIMITS = {"max_p": 5, "max_q": 5, "max_P": 2, "max_Q": 2, "max_order": 5, "maxiter": 50, "max_steps": 100}
+for _part in filter(None, os.getenv("TRAIN_SEARCH_LIMITS", "").split(",")):
+    _key, _value = _part.split("=")
+    SEARCH_LIMITS[_key.strip()] = int(_value)
 os.makedirs(MODEL_PATH, exist_ok=True)
 warnings.filterwarnings("ignore")
 
 def load_sales_data():
-    csv_path = DATA_PATH / "sales_history.csv"
-    if not csv_path.exists():
-        raise FileNotFoundError(f"Missing file: {csv_path}")
-    print(f"Loading sales data from {csv_path}...")
-    df = pd.read_csv(csv_path)
-    df['date'] = pd.to_datetime(df['date'])
-    return df
-
-def train_sku_model(sku_id, sku_df):
+    """Sales rows as a stream of chunks (see data_loader.CHUNK_ROWS)."""
+    print(f"Streaming sales data from {SALES_CSV}...")
+    return iter_table("sales_history")
+
+class SkuTimeout(BaseException):
     """
-    Trains AutoARIMA and calculates MAPE on a hidden test set.
+    Hard per-SKU limit hit. A BaseException so that auto_arima's
+    error_action='ignore' (which swallows Exception per candidate) and the
+    per-SKU `except Exception` handlers let it through to _train_sku_job.
     """
-    print(f"   Processing {sku_id}...", end=" ")
 
-    # 1. Aggregate to Daily Sums
-    daily_sales = sku_df.groupby('date')['quantity_sold'].sum()
-    idx = pd.date_range(start=daily_sales.index.min(), end=daily_sales.index.max(), freq='D')
-    daily_sales = daily_sales.reindex(idx, fill_value=0)
+class _hard_limit:
+    """SIGALRM backstop around a SKU's fits (no-op without SIGALRM or off the main thread)."""
 
-    # Need enough data for training + testing (e.g., 30 days train, 7 days test)
-    if len(daily_sales) < 40:
-        print(f"Skipped (Data < 40 days, len={len(daily_sales)})")
-        return None, None
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.armed = False
 
-    # 2. Split for Validation (Last 14 days as test)
-    train, test = daily_sales[:-14], daily_sales[-14:]
+    def _expire(self, signum, frame):
+        raise SkuTimeout(f"fit exceeded {self.seconds:g}s")
 
-    try:
-        # 3. Train AutoARIMA
-        model = pm.auto_arima(
-            train,
+    def __enter__(self):
+        if self.seconds and hasattr(signal, "SIGALRM"):
+            try:
+                self.previous = signal.signal(signal.SIGALRM, self._expire)
+                signal.setitimer(signal.ITIMER_REAL, self.seconds)
+                self.armed = True
+            except ValueError:
+                # Not the main thread
+                pass
+        return self
+
+    def __exit__(self, *exc):
+        if self.armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.previous)
+        return False
+
+def _search_arima(y, max_dur=None):
+    """
+    Bounded stepwise search: SEARCH_LIMITS caps the orders, iterations and
+    steps; `max_dur` seconds stops it at the best model found so far.
+    Returns (model, timed_out, number of candidate models fitted).
+    """
+    limits = dict(SEARCH_LIMITS)
+    max_steps = limits.pop("max_steps")
+    t0 = time.perf_counter()
+    with pm.StepwiseContext(max_steps=max_steps, max_dur=max_dur if max_dur else None):
+        fits = pm.auto_arima(
+            y,
             seasonal=True,
             m=7,
             stepwise=True,
             suppress_warnings=True,
-            error_action='ignore'
+            error_action='ignore',
+            return_valid_fits=True,
+            **limits
         )
+    # Valid fits come back sorted by information criterion, best first
+    fits = fits if isinstance(fits, (list, tuple)) else [fits]
+    return fits[0], bool(max_dur) and time.perf_counter() - t0 >= max_dur, len(fits)
+
+def train_sku_model(sku_id, daily_sales, refit_mode="search", prior=None):
+    """
+    Trains AutoARIMA and calculates MAPE on a hidden test set.
+    `daily_sales` is the SKU's zero-filled daily series (see sales_matrix).
+    `prior` is the SKU's order from the model store plus its
+    recorded search time (see load_prior_orders), used by refit_mode="warm".
+    Fits share a SKU_TIME_LIMIT budget; result["timeout"] records where it
+    ran out first ("search": a search stopped at its best model so far,
+    "refit": validation order refit instead of a second search).
+    Returns a result dict: {sku_id, model, mape, status, message, ...timings};
+    "searched_seconds" is the time this run spent in order searches (0 when
+    only fixed orders were fitted), "search_seconds" the estimated cost of one.
+    """
+    result = {"sku_id": sku_id, "model": None, "mape": None, "status": "failed", "message": "",
+              "search_seconds": None, "refit_seconds": None, "saved_seconds": None, "timeout": None,
+              "validation_seconds": None, "searched_seconds": None, "candidates": 0, "aic": None}
+
+    # Need enough data for training + testing (e.g., 30 days train, 7 days test)
+    if len(daily_sales) < 40:
+        result.update(status="skipped", message=f"Skipped (Data < 40 days, len={len(daily_sales)})")
+        return result
+
+    # 2. Split for Validation (Last 14 days as test)
+    train, test = daily_sales[:-14], daily_sales[-14:]
+
+    start = time.perf_counter()
+
+    def remaining():
+        return SKU_TIME_LIMIT - (time.perf_counter() - start) if SKU_TIME_LIMIT > 0 else None
+
+    try:
+        # 3. Train AutoARIMA (or refit the previous run's order when warm-starting)
+        t0 = time.perf_counter()
+        warm = refit_mode == "warm" and prior is not None
+        model = None
+        searched = 0.0
+        if warm:
+            try:
+                model = fit_order(train, prior)
+            except Exception:
+                warm = False
+        if model is None:
+            model, timed_out, n_fits = _search_arima(train, remaining())
+            searched += time.perf_counter() - t0
+            result["candidates"] += n_fits
+            if timed_out:
+                result["timeout"] = "search"
+        val_seconds = time.perf_counter() - t0
         
         # 4. Validate (Calculate MAPE)
         preds = model.predict(n_periods=len(test))
@@ -61,56 +191,485 @@ def train_sku_model(sku_id, sku_df):
         
         # 5. Re-train on FULL data for final export
         # (Optional but recommended for best future accuracy)
-        final_model = pm.auto_arima(
-            daily_sales,
-            seasonal=True,
-            m=7,
-            stepwise=True,
-            suppress_warnings=True,
-            error_action='ignore'
-        )
+        t1 = time.perf_counter()
+        budget = remaining()
+        if refit_mode == "search" and (budget is None or budget > 0):
+            final_model, timed_out, n_fits = _search_arima(daily_sales, budget)
+            searched += time.perf_counter() - t1
+            result["candidates"] += n_fits
+            if timed_out:
+                result["timeout"] = result["timeout"] or "search"
+        else:
+            if refit_mode == "search":
+                # Budget spent: keep the validated order instead of searching again
+                # (a validation search that ran out is still recorded as "search")
+                result["timeout"] = result["timeout"] or "refit"
+            final_model = fit_order(daily_sales, order_spec(model))
+        refit_seconds = time.perf_counter() - t1
+
+        # Saving vs. "search" mode, estimated from the cost of a full search:
+        # this run's validation search, or the one recorded when the order was found
+        search_seconds = val_seconds if not warm else prior.get("search_seconds")
+        saved = None
+        if refit_mode != "search" and search_seconds is not None:
+            skipped_searches = 1 if not warm else 2
+            spent = refit_seconds + (val_seconds if warm else 0.0)
+            saved = skipped_searches * search_seconds - spent
 
-        print(f"✓ MAPE: {mape:.2%}")
-        return final_model, mape
+        through = daily_sales.index[-1].strftime("%Y-%m-%d")
+        result.update(model=final_model, mape=mape, status="trained",
+                      search_seconds=search_seconds, refit_seconds=refit_seconds, saved_seconds=saved,
+                      validation_seconds=val_seconds, searched_seconds=searched, aic=float(final_model.aic()),
+                      trained_through=through, fitted_through=through)
+        message = f"✓ MAPE: {mape:.2%}"
+        if refit_mode != "search":
+            message += f" | {'warm ' if warm else ''}refit {refit_seconds:.1f}s"
+            if saved is not None:
+                message += f", saved ~{saved:.1f}s"
+        if result["timeout"]:
+            message += f" | ⏱ {result['timeout']} budget ({SKU_TIME_LIMIT:g}s) reached"
+        result["message"] = message
+        return result
 
     except Exception as e:
-        print(f"Failed: {e}")
-        return None, None
+        result["message"] = f"Failed: {e}"
+        return result
+
+def update_sku_model(sku_id, daily_sales, model, entry):
+    """
+    Incremental path: feeds only the observations after the SKU's
+    "trained_through" watermark into the existing model (pmdarima update()).
+    Returns a result dict; status "refit" means the caller must retrain
+    from scratch (the message holds the reason).
+    """
+    result = {"sku_id": sku_id, "model": None, "mape": entry.get("mape"), "status": "refit", "message": "",
+              "search_seconds": entry.get("search_seconds"), "refit_seconds": entry.get("refit_seconds"),
+              "saved_seconds": None, "trained_through": entry.get("trained_through"),
+              "fitted_through": entry.get("fitted_through")}
+
+    if not entry.get("trained_through") or not entry.get("fitted_through"):
+        result["message"] = "no watermark"
+        return result
+    watermark = pd.Timestamp(entry["trained_through"])
+    if watermark not in daily_sales.index:
+        # History was truncated or restated before the watermark
+        result["message"] = "watermark outside history"
+        return result
+    if entry.get("fingerprint") and series_fingerprint(daily_sales[:watermark]) != entry["fingerprint"]:
+        # Days the model already saw have changed; appending would not fix them
+        result["message"] = "history restated"
+        return result
+
+    new_obs = daily_sales[daily_sales.index > watermark]
+    if new_obs.empty:
+        result.update(model=model, status="unchanged", message="= up to date")
+        return result
+
+    age = (daily_sales.index[-1] - pd.Timestamp(entry["fitted_through"])).days
+    if age > MAX_MODEL_AGE_DAYS:
+        result["message"] = f"model age {age}d > {MAX_MODEL_AGE_DAYS}d"
+        return result
+
+    # Drift check: how well did the existing model forecast the new days?
+    preds = model.predict(n_periods=len(new_obs))
+    new_mape = mean_absolute_percentage_error(np.where(new_obs == 0, 1e-6, new_obs), preds)
+    baseline = max(entry.get("mape") or 0.0, 0.01)
+    if new_mape > DRIFT_FACTOR * baseline:
+        result["message"] = f"drift (new-days MAPE {new_mape:.2%} vs {baseline:.2%})"
+        return result
+
+    t0 = time.perf_counter()
+    model.update(new_obs)
+    result.update(model=model, status="updated",
+                  trained_through=daily_sales.index[-1].strftime("%Y-%m-%d"),
+                  message=f"↻ +{len(new_obs)}d in {time.perf_counter() - t0:.2f}s "
+                          f"(new-days MAPE {new_mape:.2%})")
+    return result
+
+def load_prior_orders(store, skus):
+    """Orders stored for each SKU in the model store, with their recorded search times."""
+    priors = {}
+    for sku in skus:
+        if sku not in store:
+            continue
+        entry = store.meta(sku)
+        if "order" in entry:
+            priors[sku] = {k: entry[k] for k in ("order", "seasonal_order", "with_intercept")}
+        else:
+            # Imported without metadata: read the order off the model itself
+            priors[sku] = order_spec(store.get(sku))
+        priors[sku]["search_seconds"] = entry.get("search_seconds")
+    return priors
+
+_worker_matrix = None
+
+def _train_sku_job(sku_id, refit_mode="search", prior=None, existing=None, method="search", deadlines=None):
+    """
+    Pool entry point: an exception in one SKU must not abort the whole run.
+    `existing` = (model, meta entry) selects the incremental update path.
+    `method` is the SKU's tier method (see sku_tiers); once a tier's
+    deadline has passed the SKU drops to the next cheaper method, and
+    "batch" comes back as status "deferred" for the vectorized tail.
+    """
+    global _worker_matrix
+    t0 = time.perf_counter()
+    assigned = method
+    deadlines = deadlines or {}
+    while method != "batch" and time.time() > deadlines.get(method, float("inf")):
+        method = cheaper_method(method)
+    tag = {"method": method, "assigned_method": assigned}
+    if method == "batch":
+        return {"sku_id": sku_id, "model": None, "mape": None, "status": "deferred",
+                "message": f"→ batch ({assigned} budget spent)", "seconds": 0.0, **tag}
+    prep_seconds = None
+    if method == "fixed":
+        # No order search: the stored order, or the default one
+        refit_mode, prior = "warm", prior or FIXED_ORDER
+    try:
+        # Each process maps the shared matrix once and slices rows from it
+        if _worker_matrix is None:
+            _worker_matrix = load_sales_matrix()
+        daily_sales = _worker_matrix.series(sku_id)
+        prep_seconds = time.perf_counter() - t0
+        with _hard_limit(SKU_TIME_LIMIT * HARD_LIMIT_FACTOR if SKU_TIME_LIMIT > 0 else 0):
+            if existing is not None:
+                res = update_sku_model(sku_id, daily_sales, *existing)
+                if res["status"] == "refit":
+                    reason = res["message"]
+                    res = train_sku_model(sku_id, daily_sales, refit_mode, prior)
+                    res["message"] = f"{res['message']} (refit: {reason})"
+            else:
+                res = train_sku_model(sku_id, daily_sales, refit_mode, prior)
+    except SkuTimeout as e:
+        # Stalled fit: keep the stored model, else the batch tier forecasts this SKU
+        res = {"sku_id": sku_id, "model": None, "mape": None, "status": "deferred", "timeout": "hard",
+               "message": f"⏱ {e} → fallback"}
+    except Exception as e:
+        res = {"sku_id": sku_id, "model": None, "mape": None, "status": "failed", "message": f"Failed: {e}"}
+    if method != assigned:
+        res["message"] += f" [{assigned} budget spent → {method}]"
+    res.update(seconds=time.perf_counter() - t0, prep_seconds=prep_seconds, **tag)
+    return res
+
+def train_all(unique_skus, n_workers=N_WORKERS, refit_mode=REFIT_MODE, priors=None, existing=None,
+              methods=None, deadlines=None):
+    """
+    Trains every SKU, in parallel when n_workers > 1.
+    `methods` maps SKUs to their tier method (default "search"); SKUs are
+    started tier by tier so `deadlines` (see sku_tiers.tier_deadlines)
+    apply in order.
+    Progress is printed as each SKU finishes; results are returned in
+    `unique_skus` order so the saved artifact does not depend on scheduling.
+    """
+    total = len(unique_skus)
+    priors = priors or {}
+    existing = existing or {}
+    methods = methods or {}
+    results = {}
+    queue = sorted(unique_skus, key=lambda sku: METHOD_ORDER.index(methods.get(sku, "search")))
+
+    def job_args(sku):
+        return (sku, refit_mode, priors.get(sku), existing.get(sku), methods.get(sku, "search"), deadlines)
+
+    def report(res):
+        print(f"   [{len(results)}/{total}] {res['sku_id']}: {res['message']}")
+
+    if n_workers <= 1:
+        for sku in queue:
+            results[sku] = _train_sku_job(*job_args(sku))
+            report(results[sku])
+    else:
+        print(f"Training with {n_workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = {pool.submit(_train_sku_job, *job_args(sku)): sku for sku in queue}
+            for fut in as_completed(futures):
+                sku = futures[fut]
+                try:
+                    results[sku] = fut.result()
+                except Exception as e:
+                    # e.g. a worker process died; only this SKU is lost
+                    results[sku] = {"sku_id": sku, "model": None, "mape": None,
+                                    "status": "failed", "message": f"Failed: {e}"}
+                report(results[sku])
+
+    return [results[sku] for sku in unique_skus]
+
+def write_tier_report(results, classes, path=TIER_REPORT):
+    """Prints and saves the per-tier accuracy/time trade-off (see sku_tiers.tier_report)."""
+    rows = tier_report(results, classes)
+    print("\nTier report (method | SKUs | demoted in | failed | timeouts | mean MAPE | seconds | s/SKU | budget):")
+    for r in rows:
+        mape = f"{r['mean_mape']:.2%}" if r["mean_mape"] is not None else "-"
+        print(f"   {r['method']:<7} {r['skus']:>6} {r['demoted_in']:>6} {r['failed']:>6} {r['timeouts']:>6} {mape:>10} "
+              f"{r['seconds']:>10.1f} {r['seconds_per_sku'] or 0:>8.2f} {r['budget_seconds'] or '-':>8}")
+    counts = {}
+    for c in classes.values():
+        counts[c] = counts.get(c, 0) + 1
+    with open(path, "w") as f:
+        json.dump({"classes": dict(sorted(counts.items())), "budgets": TIER_BUDGETS, "tiers": rows}, f, indent=2)
+    print(f"Tier report saved to: {path}")
+
+_worker_run = None
+
+def run_queue_job(job, run):
+    """job_queue handler: trains one queued SKU against the run's matrix snapshot."""
+    global _worker_matrix, _worker_run
+    run_dir = Path(run["run_dir"])
+    if _worker_run != run["run_id"]:
+        _worker_matrix = load_sales_matrix(matrix_file=run_dir / "sales_matrix.npy",
+                                           index_file=run_dir / "sales_matrix.json")
+        _worker_run = run["run_id"]
+    args = json.loads(job["args"])
+    prior = args.get("prior")
+    if prior:
+        # JSON turned the order tuples into lists
+        prior = {**prior, "order": tuple(prior["order"]), "seasonal_order": tuple(prior["seasonal_order"])}
+    existing = None
+    if args.get("existing"):
+        existing = (joblib.load(run_dir / args["existing"]), args["existing_meta"])
+    return _train_sku_job(job["sku_id"], args["refit_mode"], prior, existing, args["method"], args.get("deadlines"))
+
+def train_via_queue(unique_skus, refit_mode=REFIT_MODE, priors=None, existing=None, methods=None,
+                    deadlines=None, queue_path=QUEUE_PATH, local_workers=QUEUE_LOCAL_WORKERS,
+                    timeout=QUEUE_TIMEOUT):
+    """
+    Coordinator side of the job queue: snapshots the sales matrix into a
+    new run, enqueues one job per SKU (tier order), waits until every job is
+    done or failed (at most `timeout` seconds, see JobQueue.wait), and
+    returns the results in `unique_skus` order, like train_all.
+    Workers: python src/job_queue.py <queue.db>
+    """
+    priors, existing, methods = priors or {}, existing or {}, methods or {}
+    queue = JobQueue(queue_path)
+    run_id, run_dir = queue.create_run()
+    # Workers on other hosts read this copy; a rebuild during the run cannot change it
+    shutil.copy(MATRIX_FILE, run_dir / "sales_matrix.npy")
+    shutil.copy(INDEX_FILE, run_dir / "sales_matrix.json")
+
+    jobs = []
+    queue_order = sorted(unique_skus, key=lambda sku: METHOD_ORDER.index(methods.get(sku, "search")))
+    for i, sku in enumerate(queue_order):
+        args = {"refit_mode": refit_mode, "prior": priors.get(sku), "method": methods.get(sku, "search"),
+                "deadlines": deadlines}
+        if sku in existing:
+            os.makedirs(run_dir / "existing", exist_ok=True)
+            args["existing"] = f"existing/{i}.joblib"
+            joblib.dump(existing[sku][0], run_dir / args["existing"])
+            args["existing_meta"] = existing[sku][1]
+        jobs.append((sku, args))
+    queue.enqueue(run_id, jobs)
+    print(f"Queued {len(jobs)} SKUs in {queue_path} (run {run_id}).")
+    print(f"Start workers with: python src/job_queue.py {queue_path}")
+
+    procs = []
+    for _ in range(local_workers):
+        p = multiprocessing.Process(target=run_worker, args=(str(queue_path),), kwargs={"idle_exit": 5})
+        p.start()
+        procs.append(p)
+
+    def progress(counts):
+        finished = counts.get("done", 0) + counts.get("failed", 0)
+        print(f"   [{finished}/{len(jobs)}] leased={counts.get('leased', 0)} failed={counts.get('failed', 0)}")
+    queue.wait(run_id, timeout, progress=progress)
+
+    results = {}
+    for job in queue.jobs(run_id):
+        sku = job["sku_id"]
+        try:
+            if job["status"] != "done":
+                raise RuntimeError(job["message"] or job["status"])
+            results[sku] = joblib.load(job["result_path"])
+        except Exception as e:
+            results[sku] = {"sku_id": sku, "model": None, "mape": None, "status": "failed", "message": f"Failed: {e}"}
+        print(f"   {sku}: {results[sku]['message']}")
+    for p in procs:
+        p.join(timeout=30)
+        if p.is_alive():
+            p.terminate()
+    queue.finish_run(run_id)
+    return [results[sku] for sku in unique_skus]
 
 def main():
     print("="*60 + "\n   ARIMA TRAINING PIPELINE (WITH MAPE)\n" + "="*60)
+    global _worker_matrix
+    run_start, started_at = time.perf_counter(), time.strftime("%Y-%m-%dT%H:%M:%S")
     try:
-        df = load_sales_data()
+        _worker_matrix = get_sales_matrix(load_sales_data, SALES_CSV)
     except FileNotFoundError as e:
         print(e)
         return
 
-    unique_skus = df['sku_id'].unique()
+    unique_skus = _worker_matrix.skus
     print(f"Found {len(unique_skus)} unique SKUs.")
+    print(f"Training mode: {TRAIN_MODE} | Refit mode: {REFIT_MODE} | Tiering: {TIERING}"
+          + (f" | Queue: {QUEUE_PATH}" if QUEUE_PATH else ""))
+
+    # SKU tiers: which method each SKU gets (everything is searched when off)
+    classes, methods = {}, {}
+    if TIERING == "abc":
+        classes = classify_skus(_worker_matrix)
+        methods = {sku: TIER_METHODS[c] for sku, c in classes.items()}
+        print("Tiers: " + ", ".join(f"{m}={sum(v == m for v in methods.values())}" for m in METHOD_ORDER))
+    batch = [sku for sku in unique_skus if methods.get(sku) == "batch"]
+
+    store = open_store()
+    prev_meta = store.all_meta()
 
-    sku_models = {}
     mapes = []
+    failed = []
+    saved = []
+    counts = {"skipped": 0, "added": 0, "refit": 0, "updated": 0, "failed": 0, "batch": 0}
 
+    # Unchanged input -> keep the stored model and MAPE without loading it
+    fingerprints = {sku: _worker_matrix.fingerprint(sku) for sku in unique_skus}
+    to_train = []
+    unchanged = []
     for sku in unique_skus:
-        sku_data = df[df['sku_id'] == sku].copy()
-        model, mape = train_sku_model(sku, sku_data)
-        
-        if model:
-            sku_models[sku] = model
+        if methods.get(sku) == "batch":
+            continue
+        entry = prev_meta.get(sku, {})
+        if SKIP_UNCHANGED and sku in store and entry.get("fingerprint") == fingerprints[sku]:
+            if entry.get("mape") is not None:
+                mapes.append(entry["mape"])
+            counts["skipped"] += 1
+            unchanged.append(sku)
+        else:
+            to_train.append(sku)
+    if SKIP_UNCHANGED:
+        print(f"Unchanged SKUs skipped: {counts['skipped']} | to train: {len(to_train)}")
+
+    priors = load_prior_orders(store, [sku for sku in to_train
+                                       if REFIT_MODE == "warm" or methods.get(sku) == "fixed"])
+    existing = {}
+    if TRAIN_MODE == "incremental":
+        # Only the SKUs being updated are loaded from the store
+        existing = {sku: (store.get(sku), prev_meta[sku]) for sku in to_train if sku in store}
+
+    new_models = {}
+    meta = {}
+    deadlines = tier_deadlines(time.time()) if TIERING == "abc" else {}
+    if QUEUE_PATH:
+        results = train_via_queue(to_train, priors=priors, existing=existing, methods=methods, deadlines=deadlines)
+    else:
+        results = train_all(to_train, priors=priors, existing=existing, methods=methods, deadlines=deadlines)
+    for res in results:
+        if res["status"] == "deferred" and res["sku_id"] in store:
+            # Hard timeout or tier budget spent: the previous model is kept
+            # (only class-C SKUs lose their stored model)
+            res["message"] += " (stored model kept)"
+            counts["skipped"] += 1
+            if prev_meta[res["sku_id"]].get("mape") is not None:
+                mapes.append(prev_meta[res["sku_id"]]["mape"])
+        elif res["status"] == "deferred":
+            batch.append(res["sku_id"])
+        elif res["status"] == "failed":
+            failed.append(res["sku_id"])
+            counts["failed"] += 1
+        elif res["model"] is not None:
+            if res["sku_id"] not in store:
+                counts["added"] += 1
+            elif res["status"] == "trained":
+                counts["refit"] += 1
+            elif res["status"] == "updated":
+                counts["updated"] += 1
+            else:
+                counts["skipped"] += 1
+        if res["model"] is not None and res["status"] != "unchanged":
+            new_models[res["sku_id"]] = res["model"]
+            meta[res["sku_id"]] = {
+                **order_spec(res["model"]),
+                "mape": res["mape"],
+                "search_seconds": res["search_seconds"],
+                "refit_seconds": res["refit_seconds"],
+                "trained_through": res["trained_through"],
+                "fitted_through": res["fitted_through"],
+                "fingerprint": fingerprints[res["sku_id"]],
+            }
+            if classes:
+                meta[res["sku_id"]].update(tier=classes[res["sku_id"]], method=res["method"])
+            if res.get("timeout"):
+                meta[res["sku_id"]]["timeout"] = res["timeout"]
+            if res["mape"] is not None:
+                mapes.append(res["mape"])
+            if res["saved_seconds"] is not None:
+                saved.append(res["saved_seconds"])
+
+    # --- BATCH TIER ---
+    # No per-SKU models: the forecaster's vectorized fallback serves these
+    # SKUs, so training only scores it on the holdout for all of them at once
+    batch_results = []
+    if batch:
+        t0 = time.perf_counter()
+        batch_mape, batch_method = holdout_mape(_worker_matrix, batch)
+        per_sku = (time.perf_counter() - t0) / len(batch)
+        deferred = {res["sku_id"]: res for res in results if res["status"] == "deferred"}
+        for sku, m, fb in zip(batch, batch_mape, batch_method):
+            mape = None if np.isnan(m) else float(m)
+            res = deferred.get(sku, {})
+            batch_results.append({"sku_id": sku, "mape": mape, "status": "batch", "method": "batch",
+                                  "assigned_method": res.get("assigned_method", "batch"),
+                                  "seconds": per_sku + (res.get("seconds") or 0.0),
+                                  "timeout": res.get("timeout"), "fallback": fb})
             if mape is not None:
                 mapes.append(mape)
+        counts["batch"] = len(batch)
+        print(f"Batch tier: {len(batch)} SKUs scored in {per_sku * len(batch):.3f}s")
 
-    # --- SAVE DICTIONARY ---
-    if sku_models:
-        save_path = MODEL_PATH / "all_models.joblib"
-        joblib.dump(sku_models, save_path)
-        
+    # --- PUBLISH TO MODEL STORE ---
+    # Only retrained/updated SKUs are written; a full run also drops SKUs
+    # that no longer appear in the sales history. Class-C (batch tier) SKUs
+    # lose any stored model so the forecaster uses the fallback for them.
+    removed = [sku for sku in store.skus() if sku not in _worker_matrix] if TRAIN_MODE == "full" else []
+    removed += [sku for sku in batch if methods.get(sku) == "batch" and sku in store and sku not in removed]
+    if new_models or removed:
+        store.put_many(new_models, meta, remove=removed)
+    # Predicted demand paths for the forecaster (only stale rows are recomputed)
+    cached = refresh_forecast_cache(store) if len(store) else 0
+
+    # --- TRAINING REPORT ---
+    def sizes(sku):
+        return store.artifact_sizes(sku) if sku in store else (None, None)
+
+    rows = [sku_row(res, store.meta(res["sku_id"]), sizes(res["sku_id"]))
+            for res in results if res["sku_id"] not in batch]
+    rows += [sku_row({"sku_id": sku, "status": "unchanged", "mape": prev_meta[sku].get("mape"),
+                      "message": "fingerprint unchanged"}, store.meta(sku), sizes(sku)) for sku in unchanged]
+    rows += [sku_row(res, {"tier": classes.get(res["sku_id"])}) for res in batch_results]
+    report = build_report(rows, {
+        "started_at": started_at,
+        "wall_seconds": round(time.perf_counter() - run_start, 3),
+        "train_mode": TRAIN_MODE, "refit_mode": REFIT_MODE, "tiering": TIERING,
+        "workers": N_WORKERS, "sku_time_limit": SKU_TIME_LIMIT, "search_limits": SEARCH_LIMITS,
+    })
+    report_path = write_report(report)
+
+    if classes:
+        # Deferred SKUs are reported once, under the batch tier that served them
+        write_tier_report([res for res in results if res["sku_id"] not in batch] + batch_results, classes)
+
+    if len(store) or batch:
         avg_mape = np.mean(mapes) if mapes else 0.0
         print("\n" + "="*60)
         print(f"TRAINING COMPLETE.")
-        print(f"Models Trained: {len(sku_models)}")
+        print(f"Models in store: {len(store)} (published {len(new_models)}, removed {len(removed)})")
+        print("SKUs: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
         print(f"Average System MAPE: {avg_mape:.2%}")
-        print(f"Saved to: {save_path}")
+        print(f"Forecast cache: {cached} SKU paths recomputed")
+        if saved:
+            print(f"Refit time saved vs. full search: ~{sum(saved):.1f}s")
+        timeouts = [res for res in results if res.get("timeout")]
+        if timeouts:
+            kinds = {k: sum(res["timeout"] == k for res in timeouts) for k in ("search", "refit", "hard")}
+            print(f"SKU time limit ({SKU_TIME_LIMIT:g}s) reached: {len(timeouts)} "
+                  f"({', '.join(f'{k}={v}' for k, v in kinds.items() if v)}): "
+                  + ", ".join(res["sku_id"] for res in timeouts))
+        if failed:
+            print(f"Failed SKUs ({len(failed)}): {', '.join(failed)}")
+        peak = report["run"]["peak_memory_mb"]
+        print(f"Wall time: {report['run']['wall_seconds']:.1f}s | candidates fitted: {report['run']['candidates']}"
+              f" | peak memory: {peak['self']} MB (workers {peak['workers']} MB)")
+        print(f"Training report: {report_path}")
+        print(f"Saved to: {store.root}")
         print("="*60)
     else:
         print("\nNo models were trained.")
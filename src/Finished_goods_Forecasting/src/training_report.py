@@ -0,0 +1,113 @@
+import pandas as pd
+import json
+import math
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, peak memory is reported as None
+    resource = None
+
+# --- CONFIGURATION ---
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = BASE_DIR / "models"
+REPORT_JSON = MODEL_PATH / "training_report.json"
+REPORT_CSV = MODEL_PATH / "training_report.csv"
+# One line of run totals per training run, for tracking regressions
+HISTORY_FILE = MODEL_PATH / "training_history.jsonl"
+
+SKU_COLUMNS = ["sku_id", "status", "method", "tier", "order", "seasonal_order", "with_intercept",
+               "aic", "mape", "prep_seconds", "search_seconds", "validation_seconds", "refit_seconds", "total_seconds",
+               "candidates", "model_bytes", "compact_bytes", "timeout", "message"]
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process and of its (finished) worker processes, in MB."""
+    if resource is None:
+        return {"self": None, "workers": None}
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1 / 1e6 if sys.platform == "darwin" else 1 / 1e3
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "workers": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1),
+    }
+
+
+def sku_row(res, meta=None, sizes=(None, None)):
+    """One report row from a train_models result dict (+ its store meta entry)."""
+    meta = meta or {}
+    return {
+        "sku_id": res["sku_id"],
+        "status": res.get("status"),
+        "method": res.get("method"),
+        "tier": meta.get("tier"),
+        "order": str(tuple(meta["order"])) if meta.get("order") else None,
+        "seasonal_order": str(tuple(meta["seasonal_order"])) if meta.get("seasonal_order") else None,
+        "with_intercept": meta.get("with_intercept"),
+        "aic": res.get("aic"),
+        "mape": res.get("mape"),
+        "prep_seconds": res.get("prep_seconds"),
+        # Time inside auto_arima searches; validation_seconds is a fixed-order fit in warm/fixed modes
+        "search_seconds": res.get("searched_seconds"),
+        "validation_seconds": res.get("validation_seconds"),
+        "refit_seconds": res.get("refit_seconds") if res.get("status") == "trained" else None,
+        "total_seconds": res.get("seconds"),
+        "candidates": res.get("candidates", 0),
+        "model_bytes": sizes[0],
+        "compact_bytes": sizes[1],
+        "timeout": res.get("timeout"),
+        "message": res.get("message"),
+    }
+
+
+def json_safe(value):
+    """Copy of a report value with NaN/inf floats (at any depth) as None: JSON has no such numbers."""
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def build_report(rows, run, top=10):
+    """Report dict: run settings/totals + per-SKU rows (slowest `top` SKUs listed in the totals)."""
+    df = pd.DataFrame(rows, columns=SKU_COLUMNS)
+    timed = df.dropna(subset=["total_seconds"]).sort_values("total_seconds", ascending=False)
+    totals = {
+        "skus": len(df),
+        "status": {k: int(v) for k, v in df["status"].value_counts().items()},
+        "prep_seconds": round(float(df["prep_seconds"].sum()), 3),
+        "search_seconds": round(float(df["search_seconds"].sum()), 3),
+        "validation_seconds": round(float(df["validation_seconds"].sum()), 3),
+        "refit_seconds": round(float(df["refit_seconds"].sum()), 3),
+        "sku_seconds": round(float(df["total_seconds"].sum()), 3),
+        "candidates": int(df["candidates"].fillna(0).sum()),
+        "model_bytes": int(df["model_bytes"].fillna(0).sum()),
+        "compact_bytes": int(df["compact_bytes"].fillna(0).sum()),
+        "mean_mape": float(df["mape"].mean()) if df["mape"].notna().any() else None,
+        "timeouts": int(df["timeout"].notna().sum()),
+        "peak_memory_mb": peak_memory_mb(),
+        "slowest": timed.head(top)[["sku_id", "total_seconds", "candidates"]].to_dict(orient="records"),
+    }
+    # Missing and non-finite values (e.g. an infinite AIC) become null: NaN/Infinity are not valid JSON
+    return json_safe({"run": {**run, **totals}, "skus": df.astype(object).to_dict(orient="records")})
+
+
+def write_report(report, json_path=REPORT_JSON, csv_path=REPORT_CSV, history_path=HISTORY_FILE):
+    """Writes the JSON report, the per-SKU CSV, and appends the run totals to the history file."""
+    os.makedirs(Path(json_path).parent, exist_ok=True)
+    report = json_safe(report)
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2, default=str, allow_nan=False)
+    pd.DataFrame(report["skus"], columns=SKU_COLUMNS).to_csv(csv_path, index=False)
+    run = {k: v for k, v in report["run"].items() if k != "slowest"}
+    with open(history_path, "a") as f:
+        f.write(json.dumps({"recorded_at": datetime.now().isoformat(timespec="seconds"), **run},
+                           default=str, allow_nan=False) + "\n")
+    return json_path